@@ -0,0 +1,161 @@
+import cv2
+
+try:
+    from pyzbar import pyzbar
+except ImportError:
+    pyzbar = None
+
+try:
+    import zxingcpp
+except ImportError:
+    zxingcpp = None
+
+from config import get_barcode_backend
+
+
+class BarcodeBackend:
+    """
+    Interface of the barcode backends, every backend wraps one QR code library.
+    """
+
+    @staticmethod
+    def is_available():
+        """
+        Check whether the library of the backend is installed.
+
+        :return: True if the backend can be used, False otherwise.
+        """
+        raise NotImplementedError
+
+    def decode(self, image):
+        """
+        Read every QR code in an image.
+
+        :param image: The image (BGR or grayscale).
+
+        :return: The data of all QR codes found.
+        """
+        raise NotImplementedError
+
+
+class PyzbarBackend(BarcodeBackend):
+    """
+    Reads QR codes with zbar (needs the native `zbar` library).
+    """
+
+    @staticmethod
+    def is_available():
+        return pyzbar is not None
+
+    def decode(self, image):
+        return [barcode.data.decode("utf-8") for barcode in pyzbar.decode(image)]
+
+
+class OpenCVBackend(BarcodeBackend):
+    """
+    Reads QR codes with OpenCV's `QRCodeDetector`, no extra libraries needed.
+    """
+
+    @staticmethod
+    def is_available():
+        return hasattr(cv2, "QRCodeDetector")
+
+    def __init__(self):
+        self.detector = cv2.QRCodeDetector()
+
+    def decode(self, image):
+        found, infos, _, _ = self.detector.detectAndDecodeMulti(image)
+        if not found:
+            return []
+        # Codes that were detected but couldn't be decoded come back empty
+        return [info for info in infos if info]
+
+
+class OpenCVArucoBackend(OpenCVBackend):
+    """
+    Reads QR codes with OpenCV's `QRCodeDetectorAruco` (OpenCV 4.8+), which
+    finds the finder patterns with the ArUco marker detector.
+    """
+
+    @staticmethod
+    def is_available():
+        return hasattr(cv2, "QRCodeDetectorAruco")
+
+    def __init__(self):
+        self.detector = cv2.QRCodeDetectorAruco()
+
+
+class ZXingBackend(BarcodeBackend):
+    """
+    Reads QR codes with zxing-cpp (needs the `zxing-cpp` package).
+    """
+
+    @staticmethod
+    def is_available():
+        return zxingcpp is not None
+
+    def decode(self, image):
+        results = zxingcpp.read_barcodes(image, formats=zxingcpp.BarcodeFormat.QRCode)
+        return [result.text for result in results if result.valid]
+
+
+# Barcode backends by their config name
+BACKENDS = {
+    "pyzbar": PyzbarBackend,
+    "opencv": OpenCVBackend,
+    "opencv-aruco": OpenCVArucoBackend,
+    "zxing-cpp": ZXingBackend,
+}
+
+# Backend used by `decode_barcodes`, read from the config on first use (see `set_backend`)
+backend = None
+
+
+def get_available_backends():
+    """
+    Get the barcode backends whose libraries are installed.
+
+    :return: The backend names.
+    """
+    return [name for name, backend_class in BACKENDS.items() if backend_class.is_available()]
+
+
+def create_backend(name):
+    """
+    Create a barcode backend.
+
+    :param name: The backend name (see `BACKENDS`).
+
+    :return: The backend.
+    """
+    if name not in BACKENDS:
+        raise Exception(f"Invalid barcode backend: {name}")
+    if not BACKENDS[name].is_available():
+        raise Exception(f"The barcode backend `{name}` is not available on this machine.")
+    return BACKENDS[name]()
+
+
+def set_backend(name):
+    """
+    Switch the barcode backend of this process.
+
+    :param name: The backend name, or None to go back to the one from the config.
+
+    :return: None
+    """
+    global backend
+    backend = create_backend(name) if name is not None else None
+
+
+def decode_barcodes(image):
+    """
+    Read every QR code in an image.
+
+    :param image: The image (BGR or grayscale).
+
+    :return: The data of all QR codes found.
+    """
+    global backend
+    if backend is None:
+        backend = create_backend(get_barcode_backend())
+    return backend.decode(image)
@@ -0,0 +1,96 @@
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+from termcolor import colored
+from prettytable import PrettyTable
+from config import get_verbose
+from emulator import Emulator, set_emulator
+from file2video import Encoder
+from yt import STREAM_RESTORE, upload_video, fetch_video, decode_video, download_video, get_original_file_path, set_transport
+
+VERBOSE = get_verbose()
+
+# Size of the random file sent through the round trip by default
+BENCH_SIZE = 1024 * 1024
+
+
+def bench(size=BENCH_SIZE):
+    """
+    Send a random file through a full round trip with the local emulator
+    instead of YouTube, and report the throughput of every stage. Every stage
+    goes through the same functions as real transfers (`yt.upload_video`,
+    `yt.fetch_video` and `yt.decode_video`). Uploads are re-encoded like the
+    configured emulator rendition. With `stream_restore`, the download and the
+    decode overlap, so they are timed together as a single stage.
+
+    :param size: The file size in bytes.
+
+    :return: True if the file came back intact, False otherwise.
+    """
+    work_dir = tempfile.mkdtemp(prefix="yousync-bench-")
+    emulator = Emulator(directory=os.path.join(work_dir, "emulator"))
+    stages = []
+
+    def timed(name, length, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        # The size of uploads and downloads is only known once they are done
+        stages.append((name, elapsed, length() if callable(length) else length))
+        if VERBOSE:
+            print(colored(f"[+] Benchmark stage done: {name}", "light_green"))
+        return result
+
+    set_transport("emulator")
+    set_emulator(emulator)
+    try:
+        file_path = os.path.join(work_dir, "payload.bin")
+        with open(file_path, "wb") as file:
+            file.write(os.urandom(size))
+
+        video_path = os.path.join(work_dir, "encoded.mp4")
+        timed("encode", size, Encoder().convert, file_path, video_path)
+
+        # The title is where the file gets restored to. The video is padded in place
+        # before it's sent, so its size is taken after the upload
+        restored_path = os.path.join(work_dir, "restored.bin")
+        url = timed("upload", lambda: os.path.getsize(video_path), upload_video, video_path, "", restored_path)
+        if not url:
+            raise Exception("The upload failed.")
+
+        download_path = os.path.join(work_dir, "downloaded.mp4")
+        if STREAM_RESTORE:
+            # Download, decode and verify at the same time
+            if not timed("download + decode", size, download_video, url, download_path):
+                raise Exception("The restore failed.")
+        else:
+            title = timed("download", lambda: os.path.getsize(download_path), fetch_video, url, download_path)
+            if title is None:
+                raise Exception("The download failed.")
+            if not timed("decode", size, decode_video, download_path, get_original_file_path(title)):
+                raise Exception("The decode failed.")
+        intact = filecmp.cmp(file_path, restored_path, shallow=False)
+    except Exception as e:
+        # Settings that don't survive the re-encode fail here, the stages so far are still reported
+        print(colored(f"[-] Benchmark stopped: {e}", "red"))
+        intact = False
+    finally:
+        set_transport(None)
+        set_emulator(None)
+        emulator.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    table = PrettyTable()
+    table.field_names = ["Stage", "Seconds", "Bytes", "MB/s"]
+    for name, elapsed, length in stages:
+        table.add_row([name, round(elapsed, 2), length, round(length / max(elapsed, 1e-9) / 1e6, 2)])
+    total = sum(elapsed for _, elapsed, _ in stages)
+    table.add_row(["total", round(total, 2), size, round(size / max(total, 1e-9) / 1e6, 2)])
+    print(table)
+
+    if not intact:
+        print(colored("[-] The file didn't come back intact.", "red"))
+    return intact
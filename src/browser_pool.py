@@ -0,0 +1,188 @@
+import queue
+import atexit
+import threading
+
+from config import *
+from termcolor import colored
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.firefox.options import Options
+
+FIREFOX_PROFILE_LOCATION = get_firefox_profile_location()
+HEADLESS = get_headless()
+VERBOSE = get_verbose()
+
+
+def create_driver():
+    """
+    Start Firefox with the logged in profile.
+
+    :return: The driver.
+    """
+    # Set options
+    options = Options()
+
+    if HEADLESS:
+        options.add_argument("--headless")
+
+    # Instantiate Webdriver using Firefox profile
+    fp = webdriver.FirefoxProfile(FIREFOX_PROFILE_LOCATION)
+    return webdriver.Firefox(firefox_profile=fp, options=options)
+
+
+class BrowserSession:
+    """
+    A Firefox instance kept alive between uploads.
+    """
+
+    def __init__(self):
+        self.driver = create_driver()
+        self.uploads = 0
+
+    def is_healthy(self):
+        """
+        Check whether the browser still responds.
+
+        :return: True if the browser can be used, False otherwise.
+        """
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except WebDriverException:
+            return False
+
+    def quit(self):
+        """
+        Close the browser.
+
+        :return: None
+        """
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` warm browsers around, so uploads don't pay for starting
+    Firefox and loading the profile every time. Browsers are recycled after
+    `max_uploads` uploads, or right away when an upload fails.
+    """
+
+    def __init__(self, size=None, max_uploads=None):
+        """
+        :param size: The maximum amount of browsers, read from the config if not set.
+        :param max_uploads: Uploads per browser before it gets restarted, read from the config if not set.
+        """
+        self.size = max(1, get_browser_sessions() if size is None else size)
+        self.max_uploads = get_browser_max_uploads() if max_uploads is None else max_uploads
+
+        # Idle browsers, and a slot for every browser that may still be started
+        self.idle = queue.LifoQueue()
+        self.slots = threading.Semaphore(self.size)
+        self.lock = threading.Lock()
+        self.sessions = []
+
+    def acquire(self):
+        """
+        Get a healthy browser, starting one if none is idle. Blocks while all browsers are busy.
+
+        :return: The session.
+        """
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    session = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                if session.is_healthy():
+                    return session
+                self.discard(session)
+
+            if VERBOSE:
+                print(colored("\t=> Starting browser...", "yellow"))
+            session = BrowserSession()
+            with self.lock:
+                self.sessions.append(session)
+            return session
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, session, failed=False):
+        """
+        Hand a browser back to the pool.
+
+        :param session: The session.
+        :param failed: Whether the upload failed, the browser is restarted then.
+
+        :return: None
+        """
+        session.uploads += 1
+        if failed or (self.max_uploads and session.uploads >= self.max_uploads):
+            self.discard(session)
+        else:
+            self.idle.put(session)
+        self.slots.release()
+
+    def discard(self, session):
+        """
+        Close a browser for good.
+
+        :param session: The session.
+
+        :return: None
+        """
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+        session.quit()
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a browser for a single upload.
+
+        :return: The driver.
+        """
+        session = self.acquire()
+        try:
+            yield session.driver
+        except Exception:
+            self.release(session, failed=True)
+            raise
+        self.release(session)
+
+    def close(self):
+        """
+        Close every browser.
+
+        :return: None
+        """
+        with self.lock:
+            sessions = list(self.sessions)
+            self.sessions = []
+        for session in sessions:
+            session.quit()
+
+
+# Pool shared by every upload of this process (see `get_browser_pool`)
+browser_pool = None
+browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """
+    Get the browser pool of this process, creating it on first use.
+    The browsers are closed when the process exits.
+
+    :return: The pool.
+    """
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool()
+            atexit.register(browser_pool.close)
+        return browser_pool
@@ -0,0 +1,76 @@
+import numpy as np
+
+# Chunk size bounds, the average is set by the amount of mask bits (2^20 = 1 MiB)
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+MASK = (1 << 20) - 1
+
+# The gear hash at a position only depends on the last 32 bytes
+WINDOW = 32
+
+# Fixed seed, chunk boundaries have to be the same on every machine
+GEAR = np.random.RandomState(0x59535943).randint(0, 2**32, size=256, dtype=np.uint64).astype(np.uint32)
+
+READ_SIZE = 8 * 1024 * 1024
+
+
+def gear_hashes(data):
+    """
+    Calculate the rolling gear hash at every position of a buffer.
+
+    :param data: The bytes (uint8 array).
+
+    :return: The hashes (uint32 array), the first `WINDOW - 1` of them are incomplete.
+    """
+    gear = GEAR[data]
+    hashes = np.zeros(len(data), dtype=np.uint32)
+    for shift in range(min(WINDOW, len(data))):
+        hashes[shift:] += gear[: len(data) - shift] << np.uint32(shift)
+    return hashes
+
+
+def split_chunks(file_object):
+    """
+    Lazy function (generator) to split a file into content-defined chunks.
+    Boundaries depend on the content only, so inserting or removing bytes
+    only changes the chunks around the edit.
+
+    :param file_object: The file object.
+
+    :return: The chunks.
+    """
+    pending = b""
+    tail = b""
+    while True:
+        data = file_object.read(READ_SIZE)
+        if not data:
+            break
+
+        # Hash with the tail of the previous buffer, so boundaries don't depend on the read size
+        buffer = tail + data
+        hashes = gear_hashes(np.frombuffer(buffer, dtype=np.uint8))[len(tail):]
+        candidates = np.flatnonzero((hashes & MASK) == 0) + 1
+        tail = buffer[-(WINDOW - 1):]
+
+        # Position of the first byte of this buffer inside the pending bytes
+        pending += data
+        base = len(pending) - len(data)
+        for end in candidates:
+            length = base + end
+            while length > MAX_CHUNK_SIZE:
+                yield pending[:MAX_CHUNK_SIZE]
+                pending = pending[MAX_CHUNK_SIZE:]
+                base -= MAX_CHUNK_SIZE
+                length -= MAX_CHUNK_SIZE
+            if length < MIN_CHUNK_SIZE:
+                continue
+            yield pending[:length]
+            pending = pending[length:]
+            base -= length
+
+        while len(pending) > MAX_CHUNK_SIZE:
+            yield pending[:MAX_CHUNK_SIZE]
+            pending = pending[MAX_CHUNK_SIZE:]
+
+    if pending:
+        yield pending
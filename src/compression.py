@@ -0,0 +1,97 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compress the first MiB to decide whether a file is worth compressing
+SAMPLE_SIZE = 1024 * 1024
+
+# Files that don't shrink below this ratio are stored as-is
+INCOMPRESSIBLE_RATIO = 0.95
+
+
+def get_compressor(algorithm):
+    """
+    Create a streaming compressor.
+
+    :param algorithm: The algorithm (`zlib` or `zstd`).
+
+    :return: An object with `compress(data)` and `flush()`.
+    """
+    if algorithm == "zlib":
+        return zlib.compressobj(6)
+    elif algorithm == "zstd":
+        if zstandard is None:
+            raise Exception("The `zstandard` package is required for zstd compression.")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        raise Exception("Invalid compression algorithm.")
+
+
+def get_decompressor(algorithm):
+    """
+    Create a streaming decompressor.
+
+    :param algorithm: The algorithm (`zlib` or `zstd`).
+
+    :return: An object with `decompress(data)` and `flush()`.
+    """
+    if algorithm == "zlib":
+        return zlib.decompressobj()
+    elif algorithm == "zstd":
+        if zstandard is None:
+            raise Exception("The `zstandard` package is required for zstd compression.")
+        return zstandard.ZstdDecompressor().decompressobj()
+    else:
+        raise Exception("Invalid compression algorithm.")
+
+
+def is_compressible(sample, algorithm):
+    """
+    Check whether a sample of a file shrinks enough when compressed.
+
+    :param sample: The first bytes of the file.
+    :param algorithm: The algorithm (`zlib` or `zstd`).
+
+    :return: True if the file should be compressed, False otherwise.
+    """
+    if not sample:
+        return False
+    compressor = get_compressor(algorithm)
+    compressed = compressor.compress(sample) + compressor.flush()
+    return len(compressed) / len(sample) < INCOMPRESSIBLE_RATIO
+
+
+class DecompressingWriter:
+    """
+    File wrapper that decompresses everything written to it.
+    """
+
+    def __init__(self, file_object, algorithm):
+        """
+        :param file_object: The file object to write the decompressed data to.
+        :param algorithm: The algorithm (`zlib` or `zstd`).
+        """
+        self.file_object = file_object
+        self.decompressor = get_decompressor(algorithm)
+
+    def write(self, data):
+        """
+        Decompress data and write it.
+
+        :param data: The compressed data.
+
+        :return: None
+        """
+        self.file_object.write(self.decompressor.decompress(data))
+
+    def close(self):
+        """
+        Write the remaining data and close the file.
+
+        :return: None
+        """
+        self.file_object.write(self.decompressor.flush())
+        self.file_object.close()
@@ -80,3 +80,285 @@ def get_channel_id():
     :return: The channel ID.
     """
     return json.loads(open("config.json", "r").read())["channel_id"]
+
+
+def get_codec():
+    """
+    Get the frame codec.
+
+    :return: The frame codec (`qr`, `qr-tiled` or `grid`).
+    """
+    return json.loads(open("config.json", "r").read()).get("codec", "qr")
+
+
+def get_cell_size():
+    """
+    Get the cell size (in pixels) used by the `grid` codec.
+
+    :return: The cell size.
+    """
+    return json.loads(open("config.json", "r").read()).get("cell_size", 4)
+
+
+def get_tile_rows():
+    """
+    Get the amount of QR code rows per frame used by the `qr-tiled` codec.
+
+    :return: The amount of rows.
+    """
+    return json.loads(open("config.json", "r").read()).get("tile_rows", 2)
+
+
+def get_tile_cols():
+    """
+    Get the amount of QR code columns per frame used by the `qr-tiled` codec.
+
+    :return: The amount of columns.
+    """
+    return json.loads(open("config.json", "r").read()).get("tile_cols", 2)
+
+
+def get_encode_workers():
+    """
+    Get the amount of worker processes used to render frames.
+    `0` uses one worker per CPU core.
+
+    :return: The amount of workers.
+    """
+    return json.loads(open("config.json", "r").read()).get("encode_workers", 1)
+
+
+def get_decode_workers():
+    """
+    Get the amount of worker processes used to decode frames.
+    `0` uses one worker per CPU core.
+
+    :return: The amount of workers.
+    """
+    return json.loads(open("config.json", "r").read()).get("decode_workers", 1)
+
+
+def get_video_writer():
+    """
+    Get the video writer used to encode files.
+
+    :return: The video writer (`opencv` or `ffmpeg`).
+    """
+    return json.loads(open("config.json", "r").read()).get("video_writer", "opencv")
+
+
+def get_fec_data_chunks():
+    """
+    Get the amount of data chunks per error correction group.
+    At least 1, data and parity chunks together at most 256 (the size of GF(2^8)).
+
+    :return: The amount of data chunks.
+    """
+    return json.loads(open("config.json", "r").read()).get("fec_data_chunks", 20)
+
+
+def get_fec_parity_chunks():
+    """
+    Get the amount of parity chunks per error correction group.
+    `0` disables error correction, data and parity chunks together at most 256.
+
+    :return: The amount of parity chunks.
+    """
+    return json.loads(open("config.json", "r").read()).get("fec_parity_chunks", 0)
+
+
+def get_compression():
+    """
+    Get the compression algorithm applied before encoding.
+
+    :return: The compression algorithm (`none`, `zlib` or `zstd`).
+    """
+    return json.loads(open("config.json", "r").read()).get("compression", "none")
+
+
+def get_dedup():
+    """
+    Get the deduplication option (content-defined chunking).
+
+    :return: The deduplication option.
+    """
+    return json.loads(open("config.json", "r").read()).get("dedup", False)
+
+
+def get_frame_width():
+    """
+    Get the width of the encoded frames.
+
+    :return: The frame width.
+    """
+    return json.loads(open("config.json", "r").read()).get("frame_width", 1080)
+
+
+def get_frame_height():
+    """
+    Get the height of the encoded frames.
+
+    :return: The frame height.
+    """
+    return json.loads(open("config.json", "r").read()).get("frame_height", 1080)
+
+
+def get_chunk_size():
+    """
+    Get the amount of bytes per QR code used by the `qr` and `qr-tiled` codecs.
+
+    :return: The chunk size.
+    """
+    return json.loads(open("config.json", "r").read()).get("chunk_size", 500)
+
+
+def get_frame_rate():
+    """
+    Get the frame rate of the encoded videos.
+
+    :return: The frame rate.
+    """
+    return json.loads(open("config.json", "r").read()).get("frame_rate", 20.0)
+
+
+def update_config(values):
+    """
+    Update values in the config file.
+
+    :param values: The values to set.
+
+    :return: None
+    """
+    config = json.loads(open("config.json", "r").read())
+    config.update(values)
+    with open("config.json", "w") as config_file:
+        config_file.write(json.dumps(config, indent=4))
+
+
+def get_stream_restore():
+    """
+    Get whether downloads are decoded while the video is still downloading.
+
+    :return: The stream restore flag.
+    """
+    return json.loads(open("config.json", "r").read()).get("stream_restore", False)
+
+
+def get_barcode_backend():
+    """
+    Get the library used to read QR codes (see `barcode.BACKENDS`).
+
+    :return: The barcode backend.
+    """
+    return json.loads(open("config.json", "r").read()).get("barcode_backend", "pyzbar")
+
+
+def get_preprocess():
+    """
+    Get the steps frames go through before their QR codes are read (see `preprocess.FramePreprocessor`).
+
+    :return: The preprocessing steps.
+    """
+    return json.loads(open("config.json", "r").read()).get("preprocess", ["grayscale", "downscale", "binarize"])
+
+
+def get_retry_filters():
+    """
+    Get the filters frames are retried with when their QR codes can't be read (see `preprocess.RETRY_FILTERS`).
+
+    :return: The retry filters.
+    """
+    return json.loads(open("config.json", "r").read()).get("retry_filters", ["sharpen", "otsu", "deblock"])
+
+
+def get_browser_sessions():
+    """
+    Get the maximum amount of browsers kept open for uploading (see `browser_pool.BrowserPool`).
+
+    :return: The amount of browsers.
+    """
+    return json.loads(open("config.json", "r").read()).get("browser_sessions", 1)
+
+
+def get_browser_max_uploads():
+    """
+    Get the amount of uploads after which a browser gets restarted, `0` never restarts it.
+
+    :return: The amount of uploads.
+    """
+    return json.loads(open("config.json", "r").read()).get("browser_max_uploads", 20)
+
+
+def get_upload_timeout():
+    """
+    Get the maximum time to wait for a video to finish uploading.
+
+    :return: The upload timeout in seconds.
+    """
+    return json.loads(open("config.json", "r").read()).get("upload_timeout", 3600)
+
+
+def get_transport():
+    """
+    Get where videos are uploaded to: `youtube`, or `emulator` to keep them
+    on this machine (see `emulator.Emulator`).
+
+    :return: The transport.
+    """
+    return json.loads(open("config.json", "r").read()).get("transport", "youtube")
+
+
+def get_emulator_directory():
+    """
+    Get the directory the emulator stores videos in.
+
+    :return: The emulator directory.
+    """
+    return json.loads(open("config.json", "r").read()).get("emulator_directory", "emulator")
+
+
+def get_emulator_rendition():
+    """
+    Get the rendition the emulator re-encodes videos to (see `tune.LADDER`), `none` keeps them as uploaded.
+
+    :return: The emulator rendition.
+    """
+    return json.loads(open("config.json", "r").read()).get("emulator_rendition", "720p")
+
+
+def get_pipeline_encode_workers():
+    """
+    Get the amount of files encoded at the same time during a batch upload (see `pipeline.UploadPipeline`).
+
+    :return: The amount of encode workers.
+    """
+    return json.loads(open("config.json", "r").read()).get("pipeline_encode_workers", 1)
+
+
+def get_pipeline_upload_workers():
+    """
+    Get the amount of videos uploaded at the same time during a batch upload.
+    `0` uses one worker per browser (see `browser_sessions`).
+
+    :return: The amount of upload workers.
+    """
+    return json.loads(open("config.json", "r").read()).get("pipeline_upload_workers", 0)
+
+
+def get_pipeline_commit_workers():
+    """
+    Get the amount of workers saving uploaded files to the database during a batch upload.
+
+    :return: The amount of commit workers.
+    """
+    return json.loads(open("config.json", "r").read()).get("pipeline_commit_workers", 1)
+
+
+def get_pipeline_queue_size():
+    """
+    Get the amount of items that may wait between two stages of a batch upload.
+    Encoded videos waiting for an upload are kept in `tmp`, so this bounds its size.
+
+    :return: The queue size.
+    """
+    return json.loads(open("config.json", "r").read()).get("pipeline_queue_size", 2)
@@ -1,5 +1,6 @@
 import os
 import sys
+import json
 import uuid
 import sqlite3
 
@@ -17,8 +18,8 @@ MONGODB_DB_NAME = get_mongodb_db_name()
 VERBOSE = get_verbose()
 
 
-def connect_mongodb():
-    return MongoClient(get_mongo_uri())[MONGODB_DB_NAME]["files"]
+def connect_mongodb(collection="files"):
+    return MongoClient(get_mongo_uri())[MONGODB_DB_NAME][collection]
 
 
 def connect_sqlite():
@@ -28,6 +29,24 @@ def connect_sqlite():
         """CREATE TABLE IF NOT EXISTS files
                 (id text, file_path text, video_path text)"""
     )
+
+    # Files bundled into a pack video record where they live inside it
+    columns = [column[1] for column in cursor.execute("PRAGMA table_info(files)")]
+    for column in ("pack_offset", "pack_length", "pack_frame"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE files ADD COLUMN {column} integer")
+    if "merkle_root" not in columns:
+        cursor.execute("ALTER TABLE files ADD COLUMN merkle_root text")
+
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS chunks
+                (hash text PRIMARY KEY, video_path text, offset integer, length integer,
+                first_frame integer, last_frame integer)"""
+    )
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS manifests
+                (id text PRIMARY KEY, chunks text)"""
+    )
     return conn, cursor
 
 
@@ -55,16 +74,19 @@ def init_db():
         raise Exception("Invalid database provider.")
 
 
-def upload_file_connection(file_path, video_url, hash_id=None):
+def upload_file_connection(file_path, video_url, hash_id=None, pack=None, merkle_root=None):
     """
     Upload a file connection to the database.
 
     :param file_path: The file path.
     :param video_url: The video URL.
     :param hash_id: The UUID string.
+    :param pack: (offset, length, first frame) of the file inside a pack video, if it was packed.
+    :param merkle_root: The Merkle root of the data in the video.
 
     :return: None
     """
+    pack_offset, pack_length, pack_frame = pack if pack is not None else (None, None, None)
     if DB_PROVIDER == "mongodb":
         files_collection = connect_mongodb()
         files_collection.insert_one(
@@ -72,14 +94,27 @@ def upload_file_connection(file_path, video_url, hash_id=None):
                 "id": str(uuid.uuid4() if hash_id is None else hash_id),
                 "file_path": file_path,
                 "video_path": video_url,
+                "pack_offset": pack_offset,
+                "pack_length": pack_length,
+                "pack_frame": pack_frame,
+                "merkle_root": merkle_root,
                 "created_at": datetime.now(),
             }
         )
     elif DB_PROVIDER == "sqlite":
         conn, cursor = connect_sqlite()
         cursor.execute(
-            "INSERT INTO files VALUES (?, ?, ?)",
-            (str(uuid.uuid4() if hash_id is None else hash_id), file_path, video_url),
+            """INSERT INTO files (id, file_path, video_path, pack_offset, pack_length, pack_frame, merkle_root)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (
+                str(uuid.uuid4() if hash_id is None else hash_id),
+                file_path,
+                video_url,
+                pack_offset,
+                pack_length,
+                pack_frame,
+                merkle_root,
+            ),
         )
         conn.commit()
         conn.close()
@@ -288,9 +323,13 @@ def remove_all_files():
     if DB_PROVIDER == "mongodb":
         files_collection = connect_mongodb()
         files_collection.delete_many({})
+        connect_mongodb("chunks").delete_many({})
+        connect_mongodb("manifests").delete_many({})
     elif DB_PROVIDER == "sqlite":
         conn, cursor = connect_sqlite()
         cursor.execute("DELETE FROM files")
+        cursor.execute("DELETE FROM chunks")
+        cursor.execute("DELETE FROM manifests")
 
         conn.commit()
         conn.close()
@@ -425,3 +464,223 @@ def search_files(query):
 
     print()
     print(table)
+
+
+def get_file_id(file_path):
+    """
+    Get the ID of a file.
+
+    :param file_path: The file path (or the file ID).
+
+    :return: The file ID.
+    """
+    if DB_PROVIDER == "mongodb":
+        files_collection = connect_mongodb()
+        result = files_collection.find_one({"file_path": file_path})
+        if result is None:
+            result = files_collection.find_one({"id": file_path})
+        return result["id"] if result is not None else None
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute("SELECT * FROM files WHERE file_path=?", (file_path,))
+        result = cursor.fetchone()
+        if result is None:
+            cursor.execute("SELECT * FROM files WHERE id=?", (file_path,))
+            result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        return result[0] if result is not None else None
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def get_file_path(hash_id):
+    """
+    Get the file path of a file.
+
+    :param hash_id: The UUID string.
+
+    :return: The file path.
+    """
+    if DB_PROVIDER == "mongodb":
+        files_collection = connect_mongodb()
+        result = files_collection.find_one({"id": hash_id})
+        return result["file_path"] if result is not None else None
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute("SELECT * FROM files WHERE id=?", (hash_id,))
+        result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        return result[1] if result is not None else None
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def add_chunk(chunk_hash, video_path, offset, length, first_frame, last_frame):
+    """
+    Store where a deduplicated chunk lives.
+
+    :param chunk_hash: The SHA-256 of the chunk.
+    :param video_path: The video URL.
+    :param offset: The offset of the chunk inside the decoded video.
+    :param length: The length of the chunk.
+    :param first_frame: The first frame holding the chunk.
+    :param last_frame: The last frame holding the chunk.
+
+    :return: None
+    """
+    if DB_PROVIDER == "mongodb":
+        chunks_collection = connect_mongodb("chunks")
+        chunks_collection.insert_one(
+            {
+                "hash": chunk_hash,
+                "video_path": video_path,
+                "offset": offset,
+                "length": length,
+                "first_frame": first_frame,
+                "last_frame": last_frame,
+            }
+        )
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute(
+            "INSERT OR IGNORE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+            (chunk_hash, video_path, offset, length, first_frame, last_frame),
+        )
+        conn.commit()
+        conn.close()
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def get_chunk(chunk_hash):
+    """
+    Get where a deduplicated chunk lives.
+
+    :param chunk_hash: The SHA-256 of the chunk.
+
+    :return: The chunk (video_path, offset, length, first_frame, last_frame), or None if it is unknown.
+    """
+    if DB_PROVIDER == "mongodb":
+        chunks_collection = connect_mongodb("chunks")
+        result = chunks_collection.find_one({"hash": chunk_hash})
+        if result is None:
+            return None
+        return {key: result[key] for key in ("video_path", "offset", "length", "first_frame", "last_frame")}
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute("SELECT * FROM chunks WHERE hash=?", (chunk_hash,))
+        result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        if result is None:
+            return None
+        return {
+            "video_path": result[1],
+            "offset": result[2],
+            "length": result[3],
+            "first_frame": result[4],
+            "last_frame": result[5],
+        }
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def save_manifest(hash_id, chunk_hashes):
+    """
+    Store the list of chunks a file is made of.
+
+    :param hash_id: The UUID string.
+    :param chunk_hashes: The chunk hashes, in order.
+
+    :return: None
+    """
+    if DB_PROVIDER == "mongodb":
+        manifests_collection = connect_mongodb("manifests")
+        manifests_collection.insert_one({"id": hash_id, "chunks": chunk_hashes})
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute(
+            "INSERT INTO manifests VALUES (?, ?)", (hash_id, json.dumps(chunk_hashes))
+        )
+        conn.commit()
+        conn.close()
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def get_manifest(hash_id):
+    """
+    Get the list of chunks a file is made of.
+
+    :param hash_id: The UUID string.
+
+    :return: The chunk hashes, or None if the file was not deduplicated.
+    """
+    if DB_PROVIDER == "mongodb":
+        manifests_collection = connect_mongodb("manifests")
+        result = manifests_collection.find_one({"id": hash_id})
+        return result["chunks"] if result is not None else None
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute("SELECT * FROM manifests WHERE id=?", (hash_id,))
+        result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        return json.loads(result[1]) if result is not None else None
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def get_pack_entry(hash_id):
+    """
+    Get where a packed file lives inside its pack video.
+
+    :param hash_id: The UUID string.
+
+    :return: (offset, length, first frame) of the file, or None if it was not packed.
+    """
+    if DB_PROVIDER == "mongodb":
+        files_collection = connect_mongodb()
+        result = files_collection.find_one({"id": hash_id})
+        if result is None or result.get("pack_offset") is None:
+            return None
+        return result["pack_offset"], result["pack_length"], result["pack_frame"]
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute(
+            "SELECT pack_offset, pack_length, pack_frame FROM files WHERE id=?",
+            (hash_id,),
+        )
+        result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        if result is None or result[0] is None:
+            return None
+        return result
+    else:
+        raise Exception("Invalid database provider.")
+
+
+def get_merkle_root(hash_id):
+    """
+    Get the Merkle root of the video a file is stored in.
+
+    :param hash_id: The UUID string.
+
+    :return: The Merkle root, or None if it is not known.
+    """
+    if DB_PROVIDER == "mongodb":
+        files_collection = connect_mongodb()
+        result = files_collection.find_one({"id": hash_id})
+        return result.get("merkle_root") if result is not None else None
+    elif DB_PROVIDER == "sqlite":
+        conn, cursor = connect_sqlite()
+        cursor.execute("SELECT merkle_root FROM files WHERE id=?", (hash_id,))
+        result = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        return result[0] if result is not None else None
+    else:
+        raise Exception("Invalid database provider.")
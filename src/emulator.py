@@ -0,0 +1,180 @@
+import os
+import re
+import cv2
+import json
+import base64
+import shutil
+import threading
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from config import get_emulator_directory, get_emulator_rendition
+from tune import LADDER, transcode
+
+# Length of a YouTube video ID
+VIDEO_ID_LENGTH = 11
+
+# Bytes sent at once by the HTTP server
+SEND_SIZE = 64 * 1024
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the stored videos with HTTP range requests, like YouTube's media servers.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        size = os.path.getsize(path)
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            if start >= size:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        with open(path, "rb") as file:
+            file.seek(start)
+            left = end - start + 1
+            while left > 0:
+                piece = file.read(min(SEND_SIZE, left))
+                if not piece:
+                    break
+                self.wfile.write(piece)
+                left -= len(piece)
+
+
+class Emulator:
+    """
+    Local stand-in for YouTube, so uploads and downloads can run (and be measured)
+    without an account. Videos are stored in a directory under fake video IDs,
+    re-encoded the way YouTube would (see `tune.transcode`) and served over a
+    local HTTP server.
+    """
+
+    def __init__(self, directory=None, rendition=None):
+        """
+        :param directory: The directory to store the videos in, read from the config if not set.
+        :param rendition: The rendition videos are re-encoded to (see `tune.LADDER`), `none` to keep them as uploaded.
+        """
+        self.directory = os.path.abspath(get_emulator_directory() if directory is None else directory)
+        self.rendition = get_emulator_rendition() if rendition is None else rendition
+        if self.rendition != "none" and self.rendition not in (rung[0] for rung in LADDER):
+            raise Exception(f"Invalid emulator rendition: {self.rendition}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.server = None
+        self.lock = threading.Lock()
+
+    def get_base_url(self):
+        """
+        Get the URL of the HTTP server, starting it on first use.
+
+        :return: The base URL.
+        """
+        with self.lock:
+            if self.server is None:
+                handler = partial(RangeRequestHandler, directory=self.directory)
+                self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def upload(self, src, hash_id, title):
+        """
+        Store a video under a new fake video ID.
+
+        :param src: The prepared video path.
+        :param hash_id: The UUID string (the description on YouTube).
+        :param title: The video title.
+
+        :return: The video ID.
+        """
+        video_id = base64.urlsafe_b64encode(os.urandom(9)).decode()[:VIDEO_ID_LENGTH]
+        video_path = os.path.join(self.directory, f"{video_id}.mp4")
+
+        if self.rendition == "none":
+            shutil.copyfile(src, video_path)
+        else:
+            cap = cv2.VideoCapture(src)
+            frame_rate = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            rung = next(rung for rung in LADDER if rung[0] == self.rendition)
+            transcode(src, video_path, rung, frame_rate)
+
+        with open(os.path.join(self.directory, f"{video_id}.json"), "w") as info:
+            info.write(json.dumps({"title": title, "description": hash_id}))
+        return video_id
+
+    def get_video(self, video_id):
+        """
+        Look up a stored video.
+
+        :param video_id: The video ID.
+
+        :return: The video title and the URL of the video file.
+        """
+        info_path = os.path.join(self.directory, f"{video_id}.json")
+        if not os.path.exists(info_path):
+            raise Exception(f"Video not found in the emulator: {video_id}")
+        with open(info_path, "r") as info:
+            title = json.loads(info.read())["title"]
+        return title, f"{self.get_base_url()}/{video_id}.mp4"
+
+    def close(self):
+        """
+        Stop the HTTP server, if it was started.
+
+        :return: None
+        """
+        with self.lock:
+            if self.server is not None:
+                self.server.shutdown()
+                self.server.server_close()
+                self.server = None
+
+
+# Emulator shared by every transfer of this process (see `get_emulator`)
+emulator = None
+emulator_lock = threading.Lock()
+
+
+def get_emulator():
+    """
+    Get the emulator of this process, creating it on first use.
+
+    :return: The emulator.
+    """
+    global emulator
+    with emulator_lock:
+        if emulator is None:
+            emulator = Emulator()
+        return emulator
+
+
+def set_emulator(new_emulator):
+    """
+    Switch the emulator of this process (e.g. to a throwaway directory).
+
+    :param new_emulator: The emulator, or None to create one from the config on next use.
+
+    :return: None
+    """
+    global emulator
+    with emulator_lock:
+        emulator = new_emulator
@@ -0,0 +1,37 @@
+import zlib
+import struct
+
+# Bump this whenever the envelope layout changes
+ENVELOPE_VERSION = 1
+
+# Every chunk is prefixed with its index in the stream and the CRC32 of its data
+ENVELOPE = struct.Struct(">II")
+
+
+def wrap_chunk(index, data):
+    """
+    Prefix a chunk with its index and checksum.
+
+    :param index: The index of the chunk in the stream.
+    :param data: The chunk.
+
+    :return: The wrapped chunk.
+    """
+    return ENVELOPE.pack(index, zlib.crc32(data)) + data
+
+
+def unwrap_chunk(wrapped):
+    """
+    Strip and verify the envelope of a chunk.
+
+    :param wrapped: The wrapped chunk.
+
+    :return: The index and the chunk, or None if the chunk is corrupt.
+    """
+    if len(wrapped) < ENVELOPE.size:
+        return None
+    index, crc = ENVELOPE.unpack_from(wrapped)
+    data = wrapped[ENVELOPE.size:]
+    if zlib.crc32(data) != crc:
+        return None
+    return index, data
@@ -0,0 +1,264 @@
+import math
+import numpy as np
+
+# Arithmetic in GF(2^8), using the same primitive polynomial as QR codes
+PRIMITIVE_POLYNOMIAL = 0x11D
+
+GF_EXP = np.zeros(512, dtype=np.uint8)
+GF_LOG = np.zeros(256, dtype=np.int32)
+
+_value = 1
+for _power in range(255):
+    GF_EXP[_power] = _value
+    GF_LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= PRIMITIVE_POLYNOMIAL
+GF_EXP[255:510] = GF_EXP[:255]
+
+# Cauchy rows need a distinct field element for every chunk of a group
+MAX_GROUP_SIZE = 256
+
+
+def gf_mul(a, b):
+    """
+    Multiply two elements of GF(2^8).
+
+    :param a: The first element.
+    :param b: The second element.
+
+    :return: The product.
+    """
+    if a == 0 or b == 0:
+        return 0
+    return int(GF_EXP[GF_LOG[a] + GF_LOG[b]])
+
+
+def gf_inv(a):
+    """
+    Get the multiplicative inverse of an element of GF(2^8).
+
+    :param a: The element (non-zero).
+
+    :return: The inverse.
+    """
+    return int(GF_EXP[255 - GF_LOG[a]])
+
+
+def gf_mul_bytes(coefficient, data):
+    """
+    Multiply every byte of an array with a single coefficient.
+
+    :param coefficient: The coefficient.
+    :param data: The bytes (uint8 array).
+
+    :return: The products (uint8 array).
+    """
+    if coefficient == 0:
+        return np.zeros_like(data)
+    product = GF_EXP[GF_LOG[data] + GF_LOG[coefficient]]
+    product[data == 0] = 0
+    return product
+
+
+def cauchy_row(parity_index, data_count):
+    """
+    Get a row of the Cauchy matrix that maps data chunks to a parity chunk.
+    Every square submatrix of a Cauchy matrix is invertible, so any
+    `data_count` chunks out of a group are enough to rebuild the others.
+
+    :param parity_index: The index of the parity chunk.
+    :param data_count: The amount of data chunks in a group.
+
+    :return: The coefficients, one per data chunk.
+    """
+    x = data_count + parity_index
+    return [gf_inv(x ^ y) for y in range(data_count)]
+
+
+def encode_parity(chunks, parity_index, data_count):
+    """
+    Calculate a single parity chunk for a group of data chunks.
+
+    :param chunks: The data chunks (bytes, padded to the same length).
+    :param parity_index: The index of the parity chunk.
+    :param data_count: The amount of data chunks in a full group.
+
+    :return: The parity chunk.
+    """
+    parity = np.zeros(len(chunks[0]), dtype=np.uint8)
+    for coefficient, chunk in zip(cauchy_row(parity_index, data_count), chunks):
+        parity ^= gf_mul_bytes(coefficient, np.frombuffer(chunk, dtype=np.uint8))
+    return parity.tobytes()
+
+
+def invert_matrix(matrix):
+    """
+    Invert a square matrix over GF(2^8) (Gauss-Jordan elimination).
+
+    :param matrix: The matrix (list of rows).
+
+    :return: The inverted matrix.
+    """
+    size = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(size)] for i, row in enumerate(matrix)]
+
+    for col in range(size):
+        pivot = next(row for row in range(col, size) if rows[row][col] != 0)
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+
+        scale = gf_inv(rows[col][col])
+        rows[col] = [gf_mul(scale, value) for value in rows[col]]
+
+        for row in range(size):
+            factor = rows[row][col]
+            if row != col and factor != 0:
+                rows[row] = [value ^ gf_mul(factor, pivot_value) for value, pivot_value in zip(rows[row], rows[col])]
+
+    return [row[size:] for row in rows]
+
+
+def recover_chunks(chunks, data_count, group_data_count):
+    """
+    Rebuild the data chunks of a group from any `group_data_count` of its chunks.
+
+    :param chunks: The chunks that were read, by position in the group
+        (data chunks first, then parity chunks). All chunks are padded to the same length.
+    :param data_count: The amount of data chunks in a full group.
+    :param group_data_count: The amount of data chunks in this group (the last group can be shorter).
+
+    :return: The data chunks, or None if too many chunks are missing.
+    """
+    if all(position in chunks for position in range(group_data_count)):
+        return [chunks[position] for position in range(group_data_count)]
+
+    positions = sorted(chunks)[:group_data_count]
+    if len(positions) < group_data_count:
+        return None
+
+    # Every chunk is a linear combination of the data chunks, invert the combinations we have
+    matrix = []
+    for position in positions:
+        if position < group_data_count:
+            matrix.append([int(position == i) for i in range(group_data_count)])
+        else:
+            matrix.append(cauchy_row(position - group_data_count, data_count)[:group_data_count])
+    inverse = invert_matrix(matrix)
+
+    recovered = []
+    for row in inverse:
+        data = np.zeros(len(chunks[positions[0]]), dtype=np.uint8)
+        for coefficient, position in zip(row, positions):
+            data ^= gf_mul_bytes(coefficient, np.frombuffer(chunks[position], dtype=np.uint8))
+        recovered.append(data.tobytes())
+    return recovered
+
+
+def stream_chunk_count(chunk_count, data_count, parity_count):
+    """
+    Get the amount of chunks (data and parity) stored in a video.
+
+    :param chunk_count: The amount of data chunks.
+    :param data_count: The amount of data chunks in a full group.
+    :param parity_count: The amount of parity chunks per group.
+
+    :return: The amount of chunks.
+    """
+    return chunk_count + math.ceil(chunk_count / data_count) * parity_count
+
+
+def locate_chunk(stream_index, chunk_count, data_count, parity_count):
+    """
+    Find the group of a chunk in the stream of data and parity chunks.
+    Every group stores its data chunks first, followed by its parity chunks.
+
+    :param stream_index: The index of the chunk in the stream.
+    :param chunk_count: The amount of data chunks.
+    :param data_count: The amount of data chunks in a full group.
+    :param parity_count: The amount of parity chunks per group.
+
+    :return: The group, the position inside the group and the amount of data chunks in the group.
+    """
+    group, position = divmod(stream_index, data_count + parity_count)
+    group_data_count = min(data_count, chunk_count - group * data_count)
+    return group, position, group_data_count
+
+
+def interleave_depth(pieces_per_frame, parity_count):
+    """
+    Get the amount of groups interleaved across frames, so a single frame holds
+    at most `parity_count` chunks of any group and losing it can be repaired.
+
+    :param pieces_per_frame: The amount of chunks stored in a single frame.
+    :param parity_count: The amount of parity chunks per group.
+
+    :return: The amount of groups (1 keeps the groups one after another).
+    """
+    if parity_count == 0 or pieces_per_frame <= parity_count:
+        return 1
+    return math.ceil(pieces_per_frame / parity_count)
+
+
+def chunk_slot(stream_index, data_count, parity_count, depth):
+    """
+    Find the place of a chunk in the sequence of frame slots. Groups are
+    interleaved in blocks of `depth` groups: the first chunk of every group
+    of a block, then the second chunk of every group, and so on.
+
+    :param stream_index: The index of the chunk in the stream.
+    :param data_count: The amount of data chunks in a full group.
+    :param parity_count: The amount of parity chunks per group.
+    :param depth: The amount of interleaved groups (see `interleave_depth`).
+
+    :return: The slot, frame `slot // pieces_per_frame` holds the chunk.
+    """
+    group_size = data_count + parity_count
+    group, position = divmod(stream_index, group_size)
+    block, offset = divmod(group, depth)
+    return block * depth * group_size + position * depth + offset
+
+
+def slot_chunk(slot, chunk_count, data_count, parity_count, depth):
+    """
+    Find the chunk in a frame slot, the inverse of `chunk_slot`.
+    Slots of the last block can be empty, when its groups are missing or short.
+
+    :param slot: The slot.
+    :param chunk_count: The amount of data chunks.
+    :param data_count: The amount of data chunks in a full group.
+    :param parity_count: The amount of parity chunks per group.
+    :param depth: The amount of interleaved groups (see `interleave_depth`).
+
+    :return: The index of the chunk in the stream, or None if the slot is empty.
+    """
+    group_size = data_count + parity_count
+    block, rest = divmod(slot, depth * group_size)
+    position, offset = divmod(rest, depth)
+    group = block * depth + offset
+    if group * data_count >= chunk_count:
+        return None
+    if position >= min(data_count, chunk_count - group * data_count) + parity_count:
+        return None
+    return group * group_size + position
+
+
+def slot_count(chunk_count, data_count, parity_count, depth):
+    """
+    Get the amount of frame slots, including the empty ones.
+
+    :param chunk_count: The amount of data chunks.
+    :param data_count: The amount of data chunks in a full group.
+    :param parity_count: The amount of parity chunks per group.
+    :param depth: The amount of interleaved groups (see `interleave_depth`).
+
+    :return: The amount of slots.
+    """
+    stream_count = stream_chunk_count(chunk_count, data_count, parity_count)
+    if stream_count == 0:
+        return 0
+    group_size = data_count + parity_count
+    last_group = (chunk_count - 1) // data_count
+    return max(
+        chunk_slot(min((group + 1) * group_size, stream_count) - 1, data_count, parity_count, depth)
+        for group in range(last_group - last_group % depth, last_group + 1)
+    ) + 1
@@ -4,21 +4,23 @@ import math
 import json
 import qrcode
 import base64
-import hashlib
 import numpy as np
 
 from tqdm import tqdm
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from video_writer import open_video_writer
+from config import get_codec, get_cell_size, get_tile_rows, get_tile_cols, get_encode_workers, get_video_writer
+from pixel_grid import GRID_VERSION, encode_grid_frame, grid_capacity
+from envelope import ENVELOPE, ENVELOPE_VERSION, wrap_chunk
+from fec import MAX_GROUP_SIZE, chunk_slot, encode_parity, interleave_depth, locate_chunk, slot_chunk, slot_count, stream_chunk_count
+from config import get_fec_data_chunks, get_fec_parity_chunks, get_compression
+from config import get_frame_width, get_frame_height, get_chunk_size, get_frame_rate
+from compression import SAMPLE_SIZE, get_compressor, is_compressible
+from integrity import MerkleTree
 
-meta_data = {}
-
-width = 1080
-height = 1080
-dim = (width, height)
-chunk_size = 500
-frame_rate = 20.0
-
-file_size = 0
-chunk_count = 0
+QR_VERSION = 1
 
 
 def read_in_chunks(file_object, chunk_size=1024):
@@ -37,84 +39,497 @@ def read_in_chunks(file_object, chunk_size=1024):
             break
         yield data
 
-def checksum(large_file):
-    """
-    Calculate the checksum of a file.
-
-    :param large_file: The file path.
-
-    :return: The checksum.
-    """
-    md5_object = hashlib.md5()
-    block_size = 128 * md5_object.block_size
-    a_file = open(large_file, 'rb')
-    chunk = a_file.read(block_size)
-    while chunk:
-        md5_object.update(chunk)
-        chunk = a_file.read(block_size)
-    md5_hash = md5_object.hexdigest()
-
-    return md5_hash
-
-def create_qr(data_str):
+def create_qr(data_str, version=None):
     """
     Create a QR code.
 
     :param data_str: The data to encode.
+    :param version: The QR code version, picks the smallest version that fits if not set.
 
     :return: The QR code.
     """
     qr = qrcode.QRCode(
-        version=1,
+        version=version or 1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
         box_size=1,
         border=4,
     )
     qr.add_data(data_str)
+    qr.make(fit=version is None)
     img = qr.make_image(fill_color="black", back_color="white").convert('RGB')
     cv_img = np.array(img)
     return cv_img[:, :, ::-1].copy()
 
-def create_video():
+class Encoder:
     """
-    Create a video from a file.
-
-    :return: None
+    Converts files to videos. Every encoder holds its own settings and state,
+    so multiple conversions can run in the same process (see `convert_files_to_videos`).
+    Settings that are not passed are read from the config.
     """
-    global meta_data
-    global file_size
-    global chunk_count
 
-    # Define the codec and create VideoWriter object
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(dest, fourcc, frame_rate, dim)
+    def __init__(
+        self,
+        codec=None,
+        cell_size=None,
+        tile_rows=None,
+        tile_cols=None,
+        encode_workers=None,
+        video_writer=None,
+        fec_data_chunks=None,
+        fec_parity_chunks=None,
+        compression=None,
+        width=None,
+        height=None,
+        chunk_size=None,
+        frame_rate=None,
+    ):
+        self.codec = get_codec() if codec is None else codec
+        self.cell_size = get_cell_size() if cell_size is None else cell_size
+        self.tile_rows = get_tile_rows() if tile_rows is None else tile_rows
+        self.tile_cols = get_tile_cols() if tile_cols is None else tile_cols
+        self.encode_workers = get_encode_workers() if encode_workers is None else encode_workers
+        self.encode_workers = self.encode_workers or os.cpu_count()
+        self.video_writer = get_video_writer() if video_writer is None else video_writer
+        self.fec_data_chunks = get_fec_data_chunks() if fec_data_chunks is None else fec_data_chunks
+        self.fec_parity_chunks = get_fec_parity_chunks() if fec_parity_chunks is None else fec_parity_chunks
+        if self.fec_data_chunks < 1 or self.fec_parity_chunks < 0:
+            raise Exception("Invalid error correction group: at least one data chunk and no negative parity chunks.")
+        if self.fec_data_chunks + self.fec_parity_chunks > MAX_GROUP_SIZE:
+            raise Exception(f"Invalid error correction group: at most {MAX_GROUP_SIZE} data and parity chunks together.")
+        self.compression = get_compression() if compression is None else compression
+        self.width = get_frame_width() if width is None else width
+        self.height = get_frame_height() if height is None else height
+        self.dim = (self.width, self.height)
+        self.chunk_size = get_chunk_size() if chunk_size is None else chunk_size
+        self.frame_rate = get_frame_rate() if frame_rate is None else frame_rate
+
+        self.meta_data = {}
+        self.file_size = 0
+        self.chunk_count = 0
+        self.stream_chunk_count = 0
+        self.qr_version = None
+        self.interleave = 1
+        self.tree = None
+        self.merkle_root = None
+
+    def get_payload_size(self):
+        """
+        Get the amount of file bytes stored in a single chunk.
+
+        :return: The payload size.
+        """
+        if self.codec == "grid":
+            return grid_capacity(self.width, self.height, self.cell_size) - ENVELOPE.size
+        return self.chunk_size
+
+    def get_qr_version(self):
+        """
+        Get the QR code version that fits the largest chunk. Every data frame uses
+        the same version, so the decoder knows where the modules are (see `qr_sampler`).
+
+        :return: The QR code version.
+        """
+        data_length = len(base64.b64encode(bytes(ENVELOPE.size + self.get_payload_size())))
+        if self.codec == "qr-tiled":
+            data_length += len("{}:".format(self.stream_chunk_count))
+
+        # Byte mode is the least dense mode, any real chunk fits into this version
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data("a" * data_length)
+        qr.make(fit=True)
+        return qr.version
+
+    def get_fec_layout(self):
+        """
+        Get the error correction layout. Without parity chunks every chunk is its own group.
+
+        :return: The amount of data chunks and parity chunks per group.
+        """
+        if self.fec_parity_chunks == 0:
+            return 1, 0
+        return self.fec_data_chunks, self.fec_parity_chunks
+
+    def create_parity(self, group):
+        """
+        Create the parity chunks of a group of data chunks.
+
+        :param group: The data chunks.
+
+        :return: The parity chunks.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        payload_size = self.get_payload_size()
+        padded = [chunk.ljust(payload_size, b"\0") for chunk in group]
+        return [encode_parity(padded, parity_index, data_count) for parity_index in range(parity_count)]
+
+    def read_stream(self, file_object):
+        """
+        Lazy function (generator) to read the stream of wrapped chunks: the data chunks
+        of every group, followed by the parity chunks of that group.
+
+        :param file_object: The file object.
+
+        :return: The wrapped chunks.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        chunks = read_in_chunks(file_object, self.get_payload_size())
+        stream_index = 0
+        while True:
+            group = list(islice(chunks, data_count))
+            if not group:
+                break
+            for data in group + self.create_parity(group):
+                yield wrap_chunk(stream_index, data)
+                stream_index += 1
+
+    def read_stream_chunk(self, file_object, stream_index):
+        """
+        Read a single wrapped chunk of the stream.
+
+        :param file_object: The file object.
+        :param stream_index: The index of the chunk in the stream.
+
+        :return: The wrapped chunk.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        payload_size = self.get_payload_size()
+        group, position, group_data_count = locate_chunk(stream_index, self.chunk_count, data_count, parity_count)
+
+        if position < group_data_count:
+            file_object.seek((group * data_count + position) * payload_size)
+            data = file_object.read(payload_size)
+        else:
+            file_object.seek(group * data_count * payload_size)
+            chunks = [file_object.read(payload_size) for _ in range(group_data_count)]
+            data = self.create_parity(chunks)[position - group_data_count]
+        return wrap_chunk(stream_index, data)
+
+    def get_pieces_per_frame(self):
+        """
+        Get the amount of chunks stored in a single frame.
+
+        :return: The amount of chunks.
+        """
+        if self.codec == "qr-tiled":
+            return self.tile_rows * self.tile_cols
+        return 1
+
+    def get_interleave(self):
+        """
+        Get the amount of error correction groups interleaved across frames.
+        Only frames holding several chunks need it (see `fec.interleave_depth`).
+
+        :return: The amount of groups.
+        """
+        return interleave_depth(self.get_pieces_per_frame(), self.get_fec_layout()[1])
+
+    def get_frame_count(self):
+        """
+        Get the amount of data frames.
+
+        :return: The amount of data frames.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        slots = slot_count(self.chunk_count, data_count, parity_count, self.interleave)
+        return math.ceil(slots / self.get_pieces_per_frame())
+
+    def get_frame_indexes(self, frame_index):
+        """
+        Get the chunks stored in a data frame.
+
+        :param frame_index: The index of the data frame.
+
+        :return: The stream index of the chunk in every slot of the frame, None for empty slots.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        pieces_per_frame = self.get_pieces_per_frame()
+        slots = slot_count(self.chunk_count, data_count, parity_count, self.interleave)
+        return [
+            slot_chunk(slot, self.chunk_count, data_count, parity_count, self.interleave)
+            for slot in range(frame_index * pieces_per_frame, min((frame_index + 1) * pieces_per_frame, slots))
+        ]
+
+    def create_tiled_frame(self, pieces):
+        """
+        Create a frame holding a grid of QR codes, one per piece.
+        Every QR code is prefixed with the index of its chunk, so the decoder
+        can put them back in order.
+
+        :param pieces: (stream index, bytes) tuples, one per slot. Tiles of empty slots (None) stay blank.
+
+        :return: The frame.
+        """
+        frame = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+        tile_width = self.width // self.tile_cols
+        tile_height = self.height // self.tile_rows
+        tile_dim = min(tile_width, tile_height)
+
+        for offset, slot in enumerate(pieces):
+            if slot is None:
+                continue
+            stream_index, piece = slot
+            row, col = divmod(offset, self.tile_cols)
+            data_str = "{}:{}".format(stream_index, base64.b64encode(piece).decode('ascii'))
+            tile = cv2.resize(create_qr(data_str, self.qr_version), (tile_dim, tile_dim), interpolation=cv2.INTER_AREA)
+
+            # Center the QR code inside its tile
+            top = row * tile_height + (tile_height - tile_dim) // 2
+            left = col * tile_width + (tile_width - tile_dim) // 2
+            frame[top:top + tile_dim, left:left + tile_dim] = tile
 
-    md5_checksum = checksum(src)
-    file_stats = os.stat(src)
-    file_size = file_stats.st_size
-    chunk_count = math.ceil(file_size / chunk_size)
+        return frame
 
+    def create_frame(self, pieces):
+        """
+        Create a frame for pieces of the file, using the configured codec.
 
-    meta_data["Filename"] = os.path.basename(src)
-    meta_data["ChunkCount"] = chunk_count
-    meta_data["Filehash"] = md5_checksum
+        :param pieces: (stream index, bytes) tuples, one per slot of the frame (see `get_frame_indexes`).
 
-    first_frame = create_qr(json.dumps(meta_data, indent=4))
-    first_frame = cv2.resize(first_frame, dim, interpolation=cv2.INTER_AREA)
-    out.write(first_frame)
+        :return: The frame.
+        """
+        if self.codec == "grid":
+            return encode_grid_frame(pieces[0][1], self.width, self.height, self.cell_size)
+        if self.codec == "qr-tiled":
+            return self.create_tiled_frame(pieces)
+        frame = create_qr(base64.b64encode(pieces[0][1]).decode('ascii'), self.qr_version)
+        return cv2.resize(frame, self.dim, interpolation=cv2.INTER_AREA)
 
-    pbar = tqdm(total=chunk_count)
-    with open(src, 'rb') as f:
-        for piece in read_in_chunks(f, chunk_size):
-            frame = create_qr(base64.b64encode(piece).decode('ascii'))
-            frame = cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
-            out.write(frame)
-            pbar.update(1)
-    pbar.close()
+    def hash_pieces(self, pieces):
+        """
+        Hash the data chunks (not the parity chunks) of a frame into Merkle tree leaves.
 
+        :param pieces: (stream index, wrapped chunk) tuples, None for empty slots.
 
-    # Release everything if job is finished
-    out.release()
+        :return: (chunk index, leaf digest) tuples.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        leaves = []
+        for slot in pieces:
+            if slot is None:
+                continue
+            stream_index, piece = slot
+            group, position, group_data_count = locate_chunk(stream_index, self.chunk_count, data_count, parity_count)
+            if position < group_data_count:
+                leaves.append((group * data_count + position, self.tree.hash_leaf(piece[ENVELOPE.size:])))
+        return leaves
+
+    def count_pieces(self, pieces):
+        """
+        Count the chunks of a frame.
+
+        :param pieces: The slots of the frame, None for empty slots.
+
+        :return: The amount of chunks.
+        """
+        return sum(slot is not None for slot in pieces)
+
+    def create_frame_at(self, file_path, frame_index):
+        """
+        Read the pieces of a single frame from the file and create the frame.
+        Runs inside a worker process, see `create_frames_parallel`.
+
+        :param file_path: The file path.
+        :param frame_index: The index of the data frame.
+
+        :return: The amount of pieces, the frame and the Merkle tree leaves of its data chunks.
+        """
+        with open(file_path, 'rb') as f:
+            pieces = [
+                (stream_index, self.read_stream_chunk(f, stream_index)) if stream_index is not None else None
+                for stream_index in self.get_frame_indexes(frame_index)
+            ]
+        return self.count_pieces(pieces), self.create_frame(pieces), self.hash_pieces(pieces)
+
+    def create_frames(self, file_path):
+        """
+        Lazy function (generator) to create the frames of a file one after another.
+        Interleaved groups are read a block at a time, a frame is created once
+        every chunk it holds was read.
+
+        :param file_path: The file path.
+
+        :return: The amount of pieces, the frame and the Merkle tree leaves of its data chunks.
+        """
+        data_count, parity_count = self.get_fec_layout()
+        pieces_per_frame = self.get_pieces_per_frame()
+        block_size = self.interleave * (data_count + parity_count)
+        frame_count = self.get_frame_count()
+
+        slots = {}
+        frame_index = 0
+        with open(file_path, 'rb') as f:
+            stream = enumerate(self.read_stream(f))
+            while frame_index < frame_count:
+                block = list(islice(stream, block_size))
+                for stream_index, piece in block:
+                    slots[chunk_slot(stream_index, data_count, parity_count, self.interleave)] = (stream_index, piece)
+
+                # Slots before the end of the block are final, once the stream ended all of them are
+                if len(block) == block_size:
+                    read_slots = (block[0][0] // block_size + 1) * block_size
+                else:
+                    read_slots = math.inf
+                while frame_index < frame_count and (frame_index + 1) * pieces_per_frame <= read_slots:
+                    first_slot = frame_index * pieces_per_frame
+                    pieces = [slots.pop(slot, None) for slot in range(first_slot, first_slot + pieces_per_frame)]
+                    # The last frame only has as many slots as are left
+                    while pieces and pieces[-1] is None:
+                        pieces.pop()
+                    yield self.count_pieces(pieces), self.create_frame(pieces), self.hash_pieces(pieces)
+                    frame_index += 1
+
+    def create_frames_parallel(self, file_path):
+        """
+        Lazy function (generator) to create the frames of a file in worker processes.
+        Frames are yielded in order. At most `2 * encode_workers` frames are in flight,
+        which keeps memory bounded when the writer falls behind.
+
+        :param file_path: The file path.
+
+        :return: The amount of pieces, the frame and the Merkle tree leaves of its data chunks.
+        """
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.encode_workers) as executor:
+            for frame_index in range(self.get_frame_count()):
+                pending.append(executor.submit(self.create_frame_at, file_path, frame_index))
+                if len(pending) >= 2 * self.encode_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def compress(self, src, dest):
+        """
+        Compress a file with the configured algorithm, unless a sample of it
+        shows that it is already incompressible.
+
+        :param src: The source file path.
+        :param dest: The path to write the compressed file to.
+
+        :return: The path of the data to encode (`src` if it was not compressed).
+        """
+        if self.compression == "none":
+            return src
+
+        with open(src, 'rb') as f:
+            if not is_compressible(f.read(SAMPLE_SIZE), self.compression):
+                return src
+
+        compressor = get_compressor(self.compression)
+        with open(src, 'rb') as f, open(dest, 'wb') as out:
+            for piece in read_in_chunks(f, SAMPLE_SIZE):
+                out.write(compressor.compress(piece))
+            out.write(compressor.flush())
+        return dest
+
+    def create_meta_data(self, src, payload_path):
+        """
+        Create the metadata stored in the first frame.
+
+        :param src: The source file path.
+        :param payload_path: The path of the data to encode (see `compress`).
+
+        :return: The metadata.
+        """
+        self.tree = MerkleTree()
+        self.file_size = os.stat(payload_path).st_size
+        self.chunk_count = math.ceil(self.file_size / self.get_payload_size())
+        data_count, parity_count = self.get_fec_layout()
+        self.stream_chunk_count = stream_chunk_count(self.chunk_count, data_count, parity_count)
+
+        meta_data = {}
+        meta_data["Filename"] = os.path.basename(src)
+        meta_data["FileSize"] = self.file_size
+        meta_data["ChunkCount"] = self.chunk_count
+        meta_data["ChunkSize"] = self.get_payload_size()
+        meta_data["MerkleHash"] = self.tree.algorithm
+        meta_data["Envelope"] = ENVELOPE_VERSION
+        if payload_path != src:
+            meta_data["Compression"] = self.compression
+        self.interleave = self.get_interleave()
+        if parity_count:
+            meta_data["FecDataChunks"] = data_count
+            meta_data["FecParityChunks"] = parity_count
+        if self.interleave > 1:
+            meta_data["FecInterleave"] = self.interleave
+        meta_data["Width"] = self.width
+        meta_data["Height"] = self.height
+        meta_data["Codec"] = self.codec
+        if self.codec == "grid":
+            meta_data["CodecVersion"] = GRID_VERSION
+            meta_data["CellSize"] = self.cell_size
+        else:
+            self.qr_version = self.get_qr_version()
+            meta_data["CodecVersion"] = QR_VERSION
+            meta_data["QRVersion"] = self.qr_version
+            if self.codec == "qr-tiled":
+                meta_data["TileRows"] = self.tile_rows
+                meta_data["TileCols"] = self.tile_cols
+        return meta_data
+
+    def create_json_frame(self, data):
+        """
+        Create a frame holding JSON data (the metadata, or the trailer after the data frames).
+        The QR code stays square, centered on a white frame when the frames are not square.
+
+        :param data: The data.
+
+        :return: The frame.
+        """
+        side = min(self.width, self.height)
+        qr = create_qr(json.dumps(data, indent=4))
+        qr = cv2.resize(qr, (side, side), interpolation=cv2.INTER_AREA)
+
+        frame = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+        top = (self.height - side) // 2
+        left = (self.width - side) // 2
+        frame[top:top + side, left:left + side] = qr
+        return frame
+
+    def convert(self, src, dest):
+        """
+        Convert a file to a video.
+
+        :param src: The file path.
+        :param dest: The output file path.
+
+        :return: None
+        """
+        payload_path = self.compress(src, dest + ".payload")
+        try:
+            self.meta_data = self.create_meta_data(src, payload_path)
+
+            # Create the video writer (mp4v via OpenCV, or a libx264 ffmpeg pipe)
+            out = open_video_writer(dest, self.frame_rate, self.dim, self.video_writer)
+
+            out.write(self.create_json_frame(self.meta_data))
+
+            if self.encode_workers > 1:
+                frames = self.create_frames_parallel(payload_path)
+            else:
+                frames = self.create_frames(payload_path)
+
+            # Interleaved frames hash chunks out of order, leaves are added in chunk order
+            leaves = {}
+            next_leaf = 0
+            pbar = tqdm(total=self.stream_chunk_count)
+            for piece_count, frame, frame_leaves in frames:
+                out.write(frame)
+                leaves.update(frame_leaves)
+                while next_leaf in leaves:
+                    self.tree.add_leaf(leaves.pop(next_leaf))
+                    next_leaf += 1
+                pbar.update(piece_count)
+            pbar.close()
+
+            # The root is only known now, so it goes into a trailer frame after the data frames
+            self.merkle_root = self.tree.root()
+            out.write(self.create_json_frame({"MerkleRoot": self.merkle_root}))
+
+            # Release everything if job is finished
+            out.release()
+        finally:
+            if payload_path != src:
+                os.remove(payload_path)
 
 def convert_file_to_video(file_path, output_file_path):
     """
@@ -123,16 +538,22 @@ def convert_file_to_video(file_path, output_file_path):
     :param file_path: The file path.
     :param output_file_path: The output file path.
 
-    :return: None
+    :return: The Merkle root of the file.
     """
+    encoder = Encoder()
+    encoder.convert(file_path, output_file_path)
+    return encoder.merkle_root
 
-    # Define global variables
-    global src
-    global dest
+def convert_files_to_videos(jobs, workers=None):
+    """
+    Convert many files to videos concurrently, inside this process.
 
-    # Set global variables
-    src = file_path
-    dest = output_file_path
+    :param jobs: A list of (file path, output file path) tuples.
+    :param workers: The amount of conversions running at the same time.
 
-    # Create the video
-    create_video()
+    :return: None
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_file_to_video, file_path, output_file_path) for file_path, output_file_path in jobs]
+        for future in futures:
+            future.result()
@@ -1,21 +1,33 @@
 import os
 import uuid
+import shutil
+import hashlib
 
 from yt import *
 from db import *
 from utilities import *
-from file_manager import convert_file
+from file2video import Encoder, read_in_chunks
+from chunker import split_chunks
+from video2file import get_frame_range
+from pipeline import UploadPipeline
+
+DEDUP = get_dedup()
 
 
 def upload_file(file_path):
+    if DEDUP:
+        return upload_file_deduplicated(file_path)
+
     # Create UUID
     hash_id = str(uuid.uuid4())
 
     # Convert the file to a video
-    video_path = convert_file(file_path, mode="encode")
+    video_path = generate_temp_file_path() + ".mp4"
+    encoder = Encoder()
+    encoder.convert(file_path, video_path)
 
     # Upload file to YouTube
-    video_url = upload_video(video_path + ".mp4", hash_id, file_path)
+    video_url = upload_video(video_path, hash_id, file_path)
 
     if not video_url:
         return False
@@ -23,6 +35,78 @@ def upload_file(file_path):
     # Save the file path and video path to the database
     print(colored(f"\n[+] Saving file to database...", "light_cyan"))
     absolute_file_path = os.path.abspath(file_path)
+    upload_file_connection(
+        absolute_file_path, video_url, hash_id=hash_id, merkle_root=encoder.merkle_root
+    )
+    print(
+        colored(f"[+] Saved file to database successfully: {file_path}", "light_green")
+    )
+
+    return True
+
+
+def upload_files(file_paths):
+    # Deduplicated uploads look up the chunks stored so far, they have to run one after another
+    if DEDUP:
+        return {file_path: upload_file(file_path) for file_path in file_paths}
+
+    # Encode, upload and save different files at the same time
+    return UploadPipeline().run(file_paths)
+
+
+def upload_file_deduplicated(file_path):
+    # Create UUID
+    hash_id = str(uuid.uuid4())
+
+    # Split the file into content-defined chunks, and pack the ones we haven't stored yet
+    chunk_hashes = []
+    new_chunks = []
+    new_hashes = set()
+    pack_path = os.path.abspath(generate_temp_file_path() + ".pack")
+    offset = 0
+    with open(file_path, "rb") as f, open(pack_path, "wb") as pack:
+        for chunk in split_chunks(f):
+            chunk_hash = hashlib.sha256(chunk).hexdigest()
+            chunk_hashes.append(chunk_hash)
+            if chunk_hash in new_hashes or get_chunk(chunk_hash):
+                continue
+            pack.write(chunk)
+            new_chunks.append((chunk_hash, offset, len(chunk)))
+            new_hashes.add(chunk_hash)
+            offset += len(chunk)
+
+    if VERBOSE:
+        print(
+            colored(
+                f"[+] {len(new_chunks)} of {len(chunk_hashes)} chunks are new",
+                "light_cyan",
+            )
+        )
+
+    video_url = None
+    if new_chunks:
+        # Frame ranges are only meaningful for uncompressed videos
+        video_path = generate_temp_file_path() + ".mp4"
+        encoder = Encoder(compression="none")
+        encoder.convert(pack_path, video_path)
+
+        video_url = upload_video(video_path, hash_id, pack_path)
+        if not video_url:
+            os.remove(pack_path)
+            return False
+
+        for chunk_hash, offset, length in new_chunks:
+            first_frame, last_frame = get_frame_range(encoder.meta_data, offset, length)
+            add_chunk(chunk_hash, video_url, offset, length, first_frame, last_frame)
+    elif chunk_hashes:
+        video_url = get_chunk(chunk_hashes[0])["video_path"]
+
+    os.remove(pack_path)
+
+    # Save the chunk manifest, the file path and video path to the database
+    print(colored(f"\n[+] Saving file to database...", "light_cyan"))
+    save_manifest(hash_id, chunk_hashes)
+    absolute_file_path = os.path.abspath(file_path)
     upload_file_connection(absolute_file_path, video_url, hash_id=hash_id)
     print(
         colored(f"[+] Saved file to database successfully: {file_path}", "light_green")
@@ -31,7 +115,121 @@ def upload_file(file_path):
     return True
 
 
+def upload_files_packed(file_paths):
+    # Create UUID for the pack
+    pack_id = str(uuid.uuid4())
+
+    # Concatenate all files into a single pack
+    entries = []
+    pack_path = os.path.abspath(generate_temp_file_path() + ".pack")
+    offset = 0
+    with open(pack_path, "wb") as pack:
+        for file_path in file_paths:
+            length = 0
+            with open(file_path, "rb") as f:
+                for piece in read_in_chunks(f, 1024 * 1024):
+                    pack.write(piece)
+                    length += len(piece)
+            entries.append((file_path, offset, length))
+            offset += length
+
+    # Frame offsets are only meaningful for uncompressed videos
+    video_path = generate_temp_file_path() + ".mp4"
+    encoder = Encoder(compression="none")
+    encoder.convert(pack_path, video_path)
+    os.remove(pack_path)
+
+    # Upload the pack to YouTube
+    video_url = upload_video(video_path, pack_id, pack_path)
+
+    if not video_url:
+        return False
+
+    # Save every file with its place inside the pack to the database
+    print(colored(f"\n[+] Saving {len(entries)} files to database...", "light_cyan"))
+    for file_path, offset, length in entries:
+        first_frame, _ = get_frame_range(encoder.meta_data, offset, length)
+        upload_file_connection(
+            os.path.abspath(file_path),
+            video_url,
+            hash_id=str(uuid.uuid4()),
+            pack=(offset, length, first_frame),
+            merkle_root=encoder.merkle_root,
+        )
+    print(colored(f"[+] Saved files to database successfully", "light_green"))
+
+    return True
+
+
+def restore_chunks(out, packs):
+    # Download every pack video once, and only decode the frames holding our chunks
+    for video_url, chunks in packs.items():
+        video_path = generate_temp_file_path() + ".mp4"
+        try:
+            if fetch_video(video_url, video_path) is None:
+                return False
+
+            ranges = sorted(chunks)
+            decoded = 0
+            for chunk_range, data in zip(ranges, read_video_ranges(video_path, ranges)):
+                # Chunks are stored by their hash, a chunk that doesn't match it was decoded wrong
+                chunk_hash, places = chunks[chunk_range]
+                if hashlib.sha256(data).hexdigest() != chunk_hash:
+                    print(colored(f"[-] Chunk {chunk_hash} doesn't match its hash.", "light_red"))
+                    return False
+                for place, start, end in places:
+                    out.seek(place)
+                    out.write(data[start:end])
+                decoded += 1
+            if decoded < len(ranges):
+                return False
+        finally:
+            if os.path.exists(video_path):
+                os.remove(video_path)
+    return True
+
+
+def download_deduplicated_file(hash_id, chunk_hashes):
+    # Where every chunk goes in the file, by the pack video holding it
+    packs = {}
+    file_offset = 0
+    for chunk_hash in chunk_hashes:
+        chunk = get_chunk(chunk_hash)
+        chunks = packs.setdefault(chunk["video_path"], {})
+        _, places = chunks.setdefault((chunk["offset"], chunk["length"]), (chunk_hash, []))
+        places.append((file_offset, 0, chunk["length"]))
+        file_offset += chunk["length"]
+
+    # Rebuild the file from its chunks
+    file_path = get_file_path(hash_id)
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as out:
+        if not restore_chunks(out, packs):
+            return None
+
+    return file_path
+
+
 def download_file(file_path):
+    # Files uploaded with deduplication are rebuilt from their chunks
+    file_id = get_file_id(file_path)
+    chunk_hashes = get_manifest(file_id) if file_id else None
+    if chunk_hashes is not None:
+        return download_deduplicated_file(file_id, chunk_hashes)
+
+    # Packed files are extracted from their pack video, without decoding the rest of it
+    pack_entry = get_pack_entry(file_id) if file_id else None
+    if pack_entry is not None:
+        offset, length, _ = pack_entry
+        return download_video_range(
+            get_video_for_file_by_hash(file_id),
+            generate_temp_file_path() + ".mp4",
+            offset,
+            length,
+            get_file_path(file_id),
+        )
+
     # Get the video path for the file path
     result = get_file(file_path)
 
@@ -47,12 +245,67 @@ def download_file(file_path):
     # Generate temporary file path
     temp_path = generate_temp_file_path() + ".mp4"
 
-    # Download YouTube video by url
-    file_path = download_video(result, temp_path)
+    # Download YouTube video by url, the Merkle root is used if the trailer frame can't be read
+    file_path = download_video(result, temp_path, get_merkle_root(file_id) if file_id else None)
 
     return file_path
 
 
+def download_range(file_path, offset, length):
+    # Accept the original file path or the hash
+    file_id = get_file_id(file_path)
+    if not file_id:
+        return None
+    original_file_path = get_file_path(file_id)
+
+    # Files uploaded with deduplication: read every chunk the range overlaps, whole to check its hash
+    chunk_hashes = get_manifest(file_id)
+    if chunk_hashes is not None:
+        packs = {}
+        chunk_offset = 0
+        for chunk_hash in chunk_hashes:
+            chunk = get_chunk(chunk_hash)
+            start = max(offset, chunk_offset)
+            end = min(offset + length, chunk_offset + chunk["length"])
+            if start < end:
+                chunks = packs.setdefault(chunk["video_path"], {})
+                _, places = chunks.setdefault((chunk["offset"], chunk["length"]), (chunk_hash, []))
+                places.append((start - offset, start - chunk_offset, end - chunk_offset))
+            chunk_offset += chunk["length"]
+
+        # Ranges past the end of the file are cut off, the name is built from what is read
+        length = max(0, min(length, chunk_offset - offset))
+        range_path = "{}.{}-{}".format(original_file_path, offset, offset + length)
+        with open(range_path, "wb") as out:
+            restored = restore_chunks(out, packs)
+        if not restored:
+            os.remove(range_path)
+            return None
+        return range_path
+
+    # Packed files: the range is relative to the file's place in the pack
+    pack_entry = get_pack_entry(file_id)
+    video_offset = offset
+    if pack_entry is not None:
+        pack_offset, pack_length, _ = pack_entry
+        length = max(0, min(length, pack_length - offset))
+        video_offset += pack_offset
+
+    # Other files are cut off at their end while decoding, the name is built from what was read
+    part_path = download_video_range(
+        get_video_for_file_by_hash(file_id),
+        generate_temp_file_path() + ".mp4",
+        video_offset,
+        length,
+        generate_temp_file_path(),
+    )
+    if not part_path:
+        return None
+    range_path = "{}.{}-{}".format(original_file_path, offset, offset + os.path.getsize(part_path))
+    shutil.move(part_path, range_path)
+    return range_path
+
+
 def remove_file(file_path):
     # Get the video path for the file path
     result = get_video_for_file(file_path)
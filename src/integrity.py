@@ -0,0 +1,156 @@
+import hashlib
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# Prefixes keeping leaves and inner nodes apart (second preimage resistance)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def get_default_algorithm():
+    """
+    Get the fastest hash algorithm available.
+
+    :return: `blake3` if the `blake3` package is installed, `blake2b` otherwise.
+    """
+    return "blake3" if blake3 is not None else "blake2b"
+
+
+def hash_bytes(data, algorithm):
+    """
+    Hash bytes.
+
+    :param data: The bytes.
+    :param algorithm: The algorithm (`blake3` or `blake2b`).
+
+    :return: The 32 byte digest.
+    """
+    if algorithm == "blake3":
+        if blake3 is None:
+            raise Exception("The `blake3` package is required to verify this video.")
+        return blake3.blake3(data).digest()
+    elif algorithm == "blake2b":
+        return hashlib.blake2b(data, digest_size=32).digest()
+    else:
+        raise Exception("Invalid hash algorithm.")
+
+
+def file_checksum(file_path):
+    """
+    Calculate the MD5 checksum of a file, used by videos without a Merkle root.
+
+    :param file_path: The file path.
+
+    :return: The checksum.
+    """
+    md5_object = hashlib.md5()
+    block_size = 128 * md5_object.block_size
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(block_size), b""):
+            md5_object.update(chunk)
+    return md5_object.hexdigest()
+
+
+def buffer_checksum(buffer):
+    """
+    Calculate the MD5 checksum of a buffer (e.g. a memory mapped file), like `file_checksum`.
+
+    :param buffer: The buffer.
+
+    :return: The checksum.
+    """
+    return hashlib.md5(buffer).hexdigest()
+
+
+class MerkleTree:
+    """
+    Builds the root of a Merkle tree over the data chunks of a file, one leaf at a time.
+    Only one node per level is kept, so memory stays logarithmic in the amount of chunks.
+    Leftover nodes are folded from right to left, an unpaired node moves up unchanged.
+    """
+
+    def __init__(self, algorithm=None):
+        """
+        :param algorithm: The hash algorithm, the fastest available one if not set.
+        """
+        self.algorithm = get_default_algorithm() if algorithm is None else algorithm
+        self.levels = []
+        self.leaf_count = 0
+
+    def get_state(self):
+        """
+        Get the state of the tree, to continue it later (see `journal.Journal`).
+
+        :return: The state (JSON serializable).
+        """
+        return {
+            "levels": [digest.hex() if digest is not None else None for digest in self.levels],
+            "leaf_count": self.leaf_count,
+        }
+
+    def set_state(self, state):
+        """
+        Continue a tree from a saved state.
+
+        :param state: The state (see `get_state`).
+
+        :return: None
+        """
+        self.levels = [bytes.fromhex(digest) if digest is not None else None for digest in state["levels"]]
+        self.leaf_count = state["leaf_count"]
+
+    def hash_leaf(self, data):
+        """
+        Hash a chunk into a leaf.
+
+        :param data: The chunk.
+
+        :return: The leaf digest.
+        """
+        return hash_bytes(LEAF_PREFIX + data, self.algorithm)
+
+    def add_leaf(self, digest):
+        """
+        Add a leaf, in chunk order.
+
+        :param digest: The leaf digest (see `hash_leaf`).
+
+        :return: None
+        """
+        level = 0
+        while level < len(self.levels) and self.levels[level] is not None:
+            digest = hash_bytes(NODE_PREFIX + self.levels[level] + digest, self.algorithm)
+            self.levels[level] = None
+            level += 1
+        if level == len(self.levels):
+            self.levels.append(None)
+        self.levels[level] = digest
+        self.leaf_count += 1
+
+    def add(self, data):
+        """
+        Add a chunk, in chunk order.
+
+        :param data: The chunk.
+
+        :return: None
+        """
+        self.add_leaf(self.hash_leaf(data))
+
+    def root(self):
+        """
+        Get the root of the tree.
+
+        :return: The root (hex), the hash of nothing for an empty tree.
+        """
+        root = None
+        for digest in self.levels:
+            if digest is None:
+                continue
+            root = digest if root is None else hash_bytes(NODE_PREFIX + digest + root, self.algorithm)
+        if root is None:
+            root = hash_bytes(b"", self.algorithm)
+        return root.hex()
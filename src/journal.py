@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import threading
+
+# Seconds between two checkpoints (see `Journal.due`)
+CHECKPOINT_INTERVAL = 5
+
+
+class Journal:
+    """
+    Checkpoint file kept next to a partial restore, so an interrupted
+    download or decode can continue where it stopped instead of starting over.
+    """
+
+    def __init__(self, path):
+        """
+        Load the journal, if a previous attempt left one behind.
+
+        :param path: The journal path.
+        """
+        self.path = path
+        self.state = {}
+        self.last_checkpoint = 0
+        # The download and the decode may checkpoint from different threads
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as journal_file:
+                    self.state = json.loads(journal_file.read())
+            except ValueError:
+                self.state = {}
+
+    def get(self, key, default=None):
+        """
+        Get a value from the journal.
+
+        :param key: The key.
+        :param default: The value to return if the key is not set.
+
+        :return: The value.
+        """
+        return self.state.get(key, default)
+
+    def update(self, **values):
+        """
+        Set values and write the journal. The file is replaced atomically,
+        so a crash never leaves a half-written journal behind.
+
+        :param values: The values to set.
+
+        :return: None
+        """
+        with self.lock:
+            self.state.update(values)
+            with open(self.path + ".tmp", "w") as journal_file:
+                journal_file.write(json.dumps(self.state))
+            os.replace(self.path + ".tmp", self.path)
+
+    def checkpoint(self, **values):
+        """
+        Set values and write the journal, starting the next checkpoint interval.
+
+        :param values: The values to set.
+
+        :return: None
+        """
+        self.update(**values)
+        self.last_checkpoint = time.time()
+
+    def due(self):
+        """
+        Check whether the next checkpoint should be written.
+
+        :return: True if there was no checkpoint for `CHECKPOINT_INTERVAL` seconds.
+        """
+        return time.time() - self.last_checkpoint >= CHECKPOINT_INTERVAL
+
+    def reset(self, **values):
+        """
+        Drop everything from the journal and start over with new values.
+
+        :param values: The values to set.
+
+        :return: None
+        """
+        self.state = {}
+        self.update(**values)
+
+    def remove(self):
+        """
+        Remove the journal, after the restore finished.
+
+        :return: None
+        """
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -3,6 +3,8 @@ import sys
 from db import *
 from files import *
 from utilities import *
+from tune import tune, bench_decoders
+from benchmark import bench
 
 VERSION = "1.0.2"
 
@@ -41,22 +43,65 @@ def main():
             i += 2
         elif sys.argv[i].startswith(("-u", "--upload")):
             if i + 1 < argc:
-                path = sys.argv[-1]
+                paths = sys.argv[i + 1 :]
 
-                if file_exists(path):
-                    if upload_file(path):
+                for path in paths:
+                    if not file_exists(path):
+                        print("\n\nFile does not exist:", path)
+                        sys.exit(1)
+
+                results = upload_files(paths) if len(paths) > 1 else {paths[0]: upload_file(paths[0])}
+                for path, success in results.items():
+                    if success:
                         print(
                             "\033[1;32m\n[+] File upload successful:", path, "\033[0m"
                         )
                     else:
                         print("\033[1;33m\n\nFile upload failed:", path, "\033[0m")
+            else:
+                print("\n\nMissing argument after", sys.argv[i])
+                sys.exit(1)
+            i = argc
+        elif sys.argv[i].startswith(("-p", "--pack")):
+            if i + 1 < argc:
+                paths = sys.argv[i + 1 :]
+
+                for path in paths:
+                    if not file_exists(path):
+                        print("\n\nFile does not exist:", path)
+                        sys.exit(1)
+
+                if upload_files_packed(paths):
+                    print(
+                        "\033[1;32m\n[+] Pack upload successful:",
+                        len(paths),
+                        "files\033[0m",
+                    )
                 else:
-                    print("\n\nFile does not exist:", path)
-                    sys.exit(1)
+                    print("\033[1;33m\n\nPack upload failed\033[0m")
             else:
                 print("\n\nMissing argument after", sys.argv[i])
                 sys.exit(1)
-            i += 2
+            i = argc
+        elif sys.argv[i].startswith(("-dr", "--download-range")):
+            if i + 3 < argc:
+                path = sys.argv[-3]
+                offset = int(sys.argv[-2])
+                length = int(sys.argv[-1])
+
+                result = download_range(path, offset, length)
+
+                if result:
+                    print(
+                        "\033[1;32m\n[+] Range download successful:", result, "\033[0m"
+                    )
+                else:
+                    print("\033[1;33m\n\nRange download failed:", path, "\033[0m")
+
+            else:
+                print("\n\nMissing argument after", sys.argv[i])
+                sys.exit(1)
+            i += 4
         elif sys.argv[i].startswith(("-d", "--download")):
             if i + 1 < argc:
                 path = sys.argv[-1]
@@ -128,6 +173,24 @@ def main():
             else:
                 print("\033[1;33m\n\nFailed to remove all files\033[0m")
             i += 1
+        elif sys.argv[i].startswith(("-bd", "--bench-decoders")):
+            if bench_decoders():
+                print("\033[1;32m\n[+] Benchmark successful\033[0m")
+            else:
+                print("\033[1;33m\n\nBenchmark failed\033[0m")
+            sys.exit(0)
+        elif sys.argv[i].startswith(("-b", "--benchmark")):
+            if bench():
+                print("\033[1;32m\n[+] Benchmark successful\033[0m")
+            else:
+                print("\033[1;33m\n\nBenchmark failed\033[0m")
+            sys.exit(0)
+        elif sys.argv[i].startswith(("-t", "--tune")):
+            if tune():
+                print("\033[1;32m\n[+] Tuning successful\033[0m")
+            else:
+                print("\033[1;33m\n\nTuning failed\033[0m")
+            sys.exit(0)
         elif sys.argv[i].startswith(("-l", "--list")):
             list_files()
             sys.exit(0)
@@ -0,0 +1,118 @@
+import os
+import mmap
+
+
+def preallocate(fd, size):
+    """
+    Reserve the disk space of a file up front, so writing it can't run out of
+    space halfway and the blocks end up contiguous.
+
+    :param fd: The file descriptor.
+    :param size: The file size.
+
+    :return: None
+    """
+    os.ftruncate(fd, size)
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            # Not every file system supports it, the file is still sparse then
+            pass
+
+
+class MappedFile:
+    """
+    Output file preallocated to its final size and written through a memory map.
+    Chunks can be written at their offsets in any order, without a syscall each.
+    """
+
+    def __init__(self, path, size, resume=False):
+        """
+        Create (or reopen) the file and map it.
+
+        :param path: The file path.
+        :param size: The final file size.
+        :param resume: Whether to keep what an earlier attempt already wrote.
+        """
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self.fd = os.open(path, flags if resume else flags | os.O_TRUNC)
+        self.size = size
+        self.position = 0
+        preallocate(self.fd, size)
+
+        # Empty files can't be mapped, there is nothing to write anyway
+        self.mapping = mmap.mmap(self.fd, size) if size else None
+
+    def write_at(self, data, offset):
+        """
+        Write bytes at an offset.
+
+        :param data: The bytes.
+        :param offset: The offset.
+
+        :return: None
+        """
+        if data:
+            self.mapping[offset:offset + len(data)] = data
+
+    def write(self, data):
+        """
+        Write bytes at the current position.
+
+        :param data: The bytes.
+
+        :return: None
+        """
+        self.write_at(data, self.position)
+        self.position += len(data)
+
+    def seek(self, offset):
+        """
+        Move the current position.
+
+        :param offset: The offset.
+
+        :return: None
+        """
+        self.position = offset
+
+    def read_at(self, offset, length):
+        """
+        Read bytes back from the mapping, without a syscall.
+
+        :param offset: The offset.
+        :param length: The amount of bytes.
+
+        :return: The bytes.
+        """
+        if self.mapping is None:
+            return b""
+        return self.mapping[offset:offset + length]
+
+    def get_buffer(self):
+        """
+        Get the whole file as a buffer, to hash it without reading it back or copying it.
+
+        :return: The memory map (or empty bytes for an empty file).
+        """
+        return self.mapping if self.mapping is not None else b""
+
+    def flush(self):
+        """
+        Write the changed pages to disk (e.g. before a checkpoint).
+
+        :return: None
+        """
+        if self.mapping is not None:
+            self.mapping.flush()
+
+    def close(self):
+        """
+        Unmap and close the file.
+
+        :return: None
+        """
+        if self.mapping is not None:
+            self.mapping.close()
+        os.close(self.fd)
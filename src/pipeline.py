@@ -0,0 +1,179 @@
+import os
+import uuid
+import queue
+import threading
+
+from config import *
+from termcolor import colored
+from file2video import Encoder
+from yt import upload_video
+from db import upload_file_connection
+from utilities import generate_temp_file_path
+
+VERBOSE = get_verbose()
+
+
+class UploadPipeline:
+    """
+    Uploads many files as three stages running at the same time: encoding (CPU),
+    uploading (network) and saving to the database. While one file uploads, the
+    next ones are already being encoded.
+
+    The stages are connected by bounded queues, a stage that gets ahead blocks
+    until the next one catches up. At most `encode_workers + queue_size + upload_workers`
+    encoded videos exist in `tmp` at any time, every video is removed once it was uploaded.
+    """
+
+    def __init__(self, encode_workers=None, upload_workers=None, commit_workers=None, queue_size=None):
+        """
+        :param encode_workers: The amount of files encoded at the same time, read from the config if not set.
+        :param upload_workers: The amount of videos uploaded at the same time, read from the config if not set.
+        :param commit_workers: The amount of database workers, read from the config if not set.
+        :param queue_size: The amount of items waiting between two stages, read from the config if not set.
+        """
+        self.encode_workers = max(1, get_pipeline_encode_workers() if encode_workers is None else encode_workers)
+        self.upload_workers = get_pipeline_upload_workers() if upload_workers is None else upload_workers
+        self.upload_workers = max(1, self.upload_workers or get_browser_sessions())
+        self.commit_workers = max(1, get_pipeline_commit_workers() if commit_workers is None else commit_workers)
+        self.queue_size = max(1, get_pipeline_queue_size() if queue_size is None else queue_size)
+
+        # Files to encode, then (file path, UUID, video path, Merkle root) and (file path, UUID, video URL, Merkle root)
+        self.files = queue.Queue()
+        self.encoded = queue.Queue(self.queue_size)
+        self.uploaded = queue.Queue(self.queue_size)
+
+        self.lock = threading.Lock()
+        self.results = {}
+
+    def set_result(self, file_path, success):
+        """
+        Record whether a file was stored.
+
+        :param file_path: The file path.
+        :param success: Whether the file was stored.
+
+        :return: None
+        """
+        with self.lock:
+            self.results[file_path] = success
+
+    def encode_worker(self):
+        """
+        Convert files to videos, until the files queue runs out.
+
+        :return: None
+        """
+        while True:
+            file_path = self.files.get()
+            if file_path is None:
+                return
+
+            video_path = generate_temp_file_path() + ".mp4"
+            try:
+                encoder = Encoder()
+                encoder.convert(file_path, video_path)
+            except Exception as e:
+                print(colored(f"[-] Failed to encode {file_path}: {e}", "red"))
+                if os.path.exists(video_path):
+                    os.remove(video_path)
+                self.set_result(file_path, False)
+                continue
+
+            # Blocks while the uploads are behind, so `tmp` doesn't fill up
+            self.encoded.put((file_path, str(uuid.uuid4()), video_path, encoder.merkle_root))
+
+    def upload_worker(self):
+        """
+        Upload encoded videos, until the encoders are done.
+
+        :return: None
+        """
+        while True:
+            item = self.encoded.get()
+            if item is None:
+                return
+
+            file_path, hash_id, video_path, merkle_root = item
+            try:
+                video_url = upload_video(video_path, hash_id, file_path)
+            finally:
+                os.remove(video_path)
+
+            if not video_url:
+                self.set_result(file_path, False)
+                continue
+            self.uploaded.put((file_path, hash_id, video_url, merkle_root))
+
+    def commit_worker(self):
+        """
+        Save uploaded files to the database, until the uploads are done.
+
+        :return: None
+        """
+        while True:
+            item = self.uploaded.get()
+            if item is None:
+                return
+
+            file_path, hash_id, video_url, merkle_root = item
+            try:
+                upload_file_connection(
+                    os.path.abspath(file_path), video_url, hash_id=hash_id, merkle_root=merkle_root
+                )
+            except Exception as e:
+                print(colored(f"[-] Failed to save {file_path} to database: {e}", "red"))
+                self.set_result(file_path, False)
+                continue
+
+            print(colored(f"[+] Saved file to database successfully: {file_path}", "light_green"))
+            self.set_result(file_path, True)
+
+    def run(self, file_paths):
+        """
+        Upload files through the pipeline.
+
+        :param file_paths: The file paths. A file named more than once is only uploaded once.
+
+        :return: Whether every file was stored, by file path.
+        """
+        # Files are saved by their absolute path, paths naming the same file share its result
+        unique_paths = {}
+        for file_path in file_paths:
+            unique_paths.setdefault(os.path.abspath(file_path), file_path)
+
+        if VERBOSE:
+            print(
+                colored(
+                    f"\n[+] Uploading {len(unique_paths)} files with {self.encode_workers} encode, "
+                    f"{self.upload_workers} upload and {self.commit_workers} database workers...",
+                    "light_cyan",
+                )
+            )
+
+        for file_path in unique_paths.values():
+            self.files.put(file_path)
+
+        # Every stage is told to stop once the stage before it is done
+        stages = [
+            (self.encode_worker, self.encode_workers, self.files),
+            (self.upload_worker, self.upload_workers, self.encoded),
+            (self.commit_worker, self.commit_workers, self.uploaded),
+        ]
+        threads = [
+            [threading.Thread(target=worker, daemon=True) for _ in range(count)]
+            for worker, count, _ in stages
+        ]
+        for stage_threads in threads:
+            for thread in stage_threads:
+                thread.start()
+
+        for (_, count, inbox), stage_threads in zip(stages, threads):
+            for _ in range(count):
+                inbox.put(None)
+            for thread in stage_threads:
+                thread.join()
+
+        return {
+            file_path: self.results.get(unique_paths[os.path.abspath(file_path)], False)
+            for file_path in file_paths
+        }
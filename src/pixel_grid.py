@@ -0,0 +1,147 @@
+import cv2
+import struct
+import numpy as np
+
+# Bump this whenever the frame layout changes
+GRID_VERSION = 1
+
+# Every frame starts with the payload length (4 bytes, big endian)
+LENGTH_PREFIX = struct.Struct(">I")
+
+
+def grid_shape(width, height, cell_size):
+    """
+    Get the amount of cells that fit into a frame.
+
+    :param width: The frame width.
+    :param height: The frame height.
+    :param cell_size: The cell size in pixels.
+
+    :return: The amount of rows and columns.
+    """
+    return height // cell_size, width // cell_size
+
+
+def grid_capacity(width, height, cell_size):
+    """
+    Get the amount of payload bytes a single frame can hold.
+
+    The outer ring of cells is reserved for the timing and sync borders.
+
+    :param width: The frame width.
+    :param height: The frame height.
+    :param cell_size: The cell size in pixels.
+
+    :return: The capacity in bytes.
+    """
+    rows, cols = grid_shape(width, height, cell_size)
+    return ((rows - 2) * (cols - 2)) // 8 - LENGTH_PREFIX.size
+
+
+def border_cells(rows, cols):
+    """
+    Build the expected border pattern.
+
+    The top row and left column alternate between black and white (timing),
+    the bottom row and right column are solid black (sync).
+
+    :param rows: The amount of rows.
+    :param cols: The amount of columns.
+
+    :return: The cell matrix with only the borders set (1 = black).
+    """
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    cells[0, :] = np.arange(cols) % 2 == 0
+    cells[:, 0] = np.arange(rows) % 2 == 0
+    cells[-1, :] = 1
+    cells[:, -1] = 1
+    return cells
+
+
+def encode_grid_frame(data, width, height, cell_size):
+    """
+    Draw raw bytes into a frame as black and white cells.
+
+    :param data: The bytes to encode.
+    :param width: The frame width.
+    :param height: The frame height.
+    :param cell_size: The cell size in pixels.
+
+    :return: The frame (BGR).
+    """
+    rows, cols = grid_shape(width, height, cell_size)
+    if len(data) > grid_capacity(width, height, cell_size):
+        raise ValueError("Data does not fit into a single frame.")
+
+    bits = np.unpackbits(
+        np.frombuffer(LENGTH_PREFIX.pack(len(data)) + data, dtype=np.uint8)
+    )
+    data_cells = np.zeros((rows - 2) * (cols - 2), dtype=np.uint8)
+    data_cells[: bits.size] = bits
+
+    cells = border_cells(rows, cols)
+    cells[1:-1, 1:-1] = data_cells.reshape(rows - 2, cols - 2)
+
+    pixels = np.full((height, width), 255, dtype=np.uint8)
+    pixels[: rows * cell_size, : cols * cell_size] = np.where(
+        cells.repeat(cell_size, axis=0).repeat(cell_size, axis=1), 0, 255
+    )
+    return cv2.cvtColor(pixels, cv2.COLOR_GRAY2BGR)
+
+
+def sample_cells(frame, cell_size):
+    """
+    Sample the average brightness of the center of every cell.
+
+    :param frame: The frame (BGR or grayscale).
+    :param cell_size: The cell size in pixels.
+
+    :return: The brightness matrix.
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    rows, cols = grid_shape(gray.shape[1], gray.shape[0], cell_size)
+
+    # Only look at the inner half of each cell, edges get smeared by compression
+    low = cell_size // 4
+    high = max(cell_size - low, low + 1)
+    blocks = gray[: rows * cell_size, : cols * cell_size].reshape(
+        rows, cell_size, cols, cell_size
+    )
+    return blocks[:, low:high, :, low:high].mean(axis=(1, 3))
+
+
+def decode_grid_frame(frame, cell_size):
+    """
+    Read the raw bytes back from a frame.
+
+    :param frame: The frame (BGR or grayscale).
+    :param cell_size: The cell size in pixels.
+
+    :return: The decoded bytes, or None if the frame could not be read.
+    """
+    samples = sample_cells(frame, cell_size)
+    rows, cols = samples.shape
+    expected = border_cells(rows, cols)
+
+    # Calibrate the threshold on the timing row
+    timing = samples[0, :-1]
+    timing_black = timing[expected[0, :-1] == 1]
+    timing_white = timing[expected[0, :-1] == 0]
+    threshold = (timing_black.mean() + timing_white.mean()) / 2
+    cells = (samples < threshold).astype(np.uint8)
+
+    # The borders have to match, otherwise the geometry is off
+    if (
+        not np.array_equal(cells[0, :], expected[0, :])
+        or not np.array_equal(cells[:, 0], expected[:, 0])
+        or not cells[-1, :].all()
+        or not cells[:, -1].all()
+    ):
+        return None
+
+    data = np.packbits(cells[1:-1, 1:-1].reshape(-1)).tobytes()
+    (length,) = LENGTH_PREFIX.unpack_from(data)
+    if length > ((rows - 2) * (cols - 2)) // 8 - LENGTH_PREFIX.size:
+        return None
+
+    return data[LENGTH_PREFIX.size : LENGTH_PREFIX.size + length]
@@ -0,0 +1,175 @@
+import cv2
+
+from config import get_preprocess, get_retry_filters
+from qr_sampler import QR_BORDER, get_qr_layout, qr_module_count
+
+# Pixels per QR module after downscaling, OpenCV's detectors stop finding codes below 4
+MODULE_PIXELS = 4
+
+# Neighbourhood of the adaptive threshold, in modules
+THRESHOLD_MODULES = 8
+
+# Subtracted from the neighbourhood mean, keeps flat areas white
+THRESHOLD_OFFSET = 10
+
+
+def get_module_size(meta_data):
+    """
+    Get the size of a QR module in the data area of a frame.
+
+    :param meta_data: The metadata from the first frame, or None.
+
+    :return: The module size in pixels, or None if the QR version isn't fixed.
+    """
+    if not meta_data or "QRVersion" not in meta_data:
+        return None
+    pixels = qr_module_count(meta_data["QRVersion"]) + 2 * QR_BORDER
+    return min(min(width, height) for _, _, width, height in get_qr_layout(meta_data)) / pixels
+
+
+def to_grayscale(frame):
+    """
+    Convert a frame to grayscale, barcodes don't need color.
+
+    :param frame: The frame (BGR or grayscale).
+
+    :return: The grayscale frame.
+    """
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def sharpen(gray):
+    """
+    Sharpen module edges that got blurred by compression (unsharp mask).
+
+    :param gray: The frame (grayscale).
+
+    :return: The filtered frame.
+    """
+    blurred = cv2.GaussianBlur(gray, (0, 0), 2)
+    return cv2.addWeighted(gray, 1.5, blurred, -0.5, 0)
+
+
+def otsu(gray):
+    """
+    Binarize a frame with a single threshold calculated from its histogram.
+
+    :param gray: The frame (grayscale).
+
+    :return: The filtered frame.
+    """
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def deblock(gray):
+    """
+    Smooth out compression blocks while keeping the module edges, then binarize.
+
+    :param gray: The frame (grayscale).
+
+    :return: The filtered frame.
+    """
+    return otsu(cv2.bilateralFilter(gray, 5, 75, 75))
+
+
+# Filters tried by `FramePreprocessor.candidates` when a frame can't be read, in order
+RETRY_FILTERS = {
+    "sharpen": sharpen,
+    "otsu": otsu,
+    "deblock": deblock,
+}
+
+
+class FramePreprocessor:
+    """
+    Turns video frames into small black and white images before they are handed
+    to the barcode reader. The QR codes were upscaled from a few pixels per module,
+    so shrinking them back makes reading them a lot cheaper. Frames that still
+    can't be read are retried with stronger filters (see `RETRY_FILTERS`).
+    """
+
+    def __init__(self, meta_data=None, steps=None, retry_filters=None):
+        """
+        :param meta_data: The metadata from the first frame, None for the first frame itself.
+        :param steps: The steps (`grayscale`, `downscale`, `binarize`), read from the config if not set.
+        :param retry_filters: The filters to retry with (see `RETRY_FILTERS`), read from the config if not set.
+        """
+        self.meta_data = meta_data
+        self.steps = get_preprocess() if steps is None else steps
+        self.retry_filters = get_retry_filters() if retry_filters is None else retry_filters
+        for name in self.retry_filters:
+            if name not in RETRY_FILTERS:
+                raise Exception(f"Invalid retry filter: {name}")
+
+        # Downscaling and adaptive thresholds need the module size
+        self.module_size = get_module_size(meta_data)
+
+    def capture(self, frame):
+        """
+        Prepare a frame right after it was read from the video. Dropping the
+        color early makes every later step (and sending frames to worker processes) cheaper.
+
+        :param frame: The frame.
+
+        :return: The frame, in grayscale if enabled.
+        """
+        return to_grayscale(frame) if "grayscale" in self.steps else frame
+
+    def downscale(self, image):
+        """
+        Shrink a frame until a module is about `MODULE_PIXELS` wide.
+
+        :param image: The frame.
+
+        :return: The frame and the module size in it, or None if unknown.
+        """
+        if self.module_size is None:
+            return image, None
+
+        # The data area may have been scaled onto a larger canvas (see `video2file.crop_frame`)
+        frame_height, frame_width = image.shape[:2]
+        scale = min(frame_width / self.meta_data.get("Width", 1080), frame_height / self.meta_data.get("Height", 1080))
+        module_size = self.module_size * scale
+        if "downscale" not in self.steps or module_size <= MODULE_PIXELS:
+            return image, module_size
+
+        factor = MODULE_PIXELS / module_size
+        image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        return image, MODULE_PIXELS
+
+    def binarize(self, gray, module_size):
+        """
+        Binarize a frame against the brightness of the surrounding modules.
+
+        :param gray: The frame (grayscale).
+        :param module_size: The module size in the frame.
+
+        :return: The black and white frame.
+        """
+        block_size = int(module_size * THRESHOLD_MODULES) | 1
+        return cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block_size, THRESHOLD_OFFSET
+        )
+
+    def candidates(self, frame):
+        """
+        Lazy function (generator) for the images to try reading a frame from,
+        the preprocessed frame first and then every retry filter.
+
+        :param frame: The frame.
+
+        :return: The images.
+        """
+        image = self.capture(frame)
+        image, module_size = self.downscale(image)
+
+        # Big modules would get hollowed out by a local threshold, it only runs at a known module size
+        if "binarize" in self.steps and module_size is not None and image.ndim == 2:
+            yield self.binarize(image, module_size)
+        else:
+            yield image
+
+        if self.retry_filters:
+            gray = to_grayscale(image)
+            for name in self.retry_filters:
+                yield RETRY_FILTERS[name](gray)
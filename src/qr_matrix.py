@@ -0,0 +1,389 @@
+import numpy as np
+
+from qrcode import util
+from qrcode.base import rs_blocks
+
+from fec import GF_EXP, GF_LOG, gf_inv, gf_mul
+
+# Characters of the alphanumeric mode, by value
+ALPHANUMERIC = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+
+# Format info (error correction level and mask) of every possible code word
+FORMAT_CODES = {util.BCH_type_info(data): data for data in range(32)}
+
+# Bit errors corrected in the format info, the code has a minimum distance of 7
+FORMAT_ERRORS = 3
+
+# Mask patterns as in `qrcode.util.mask_func`, for arrays of rows and columns
+MASKS = [
+    lambda i, j: (i + j) % 2 == 0,
+    lambda i, j: i % 2 == 0,
+    lambda i, j: j % 3 == 0,
+    lambda i, j: (i + j) % 3 == 0,
+    lambda i, j: (i // 2 + j // 3) % 2 == 0,
+    lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
+    lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+    lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+]
+
+
+def qr_module_count(version):
+    """
+    Get the amount of modules per side of a QR code.
+
+    :param version: The QR code version.
+
+    :return: The amount of modules.
+    """
+    return 4 * version + 17
+
+
+def get_function_modules(version):
+    """
+    Mark the modules that don't hold data: finder patterns (with their separators
+    and the format info), timing patterns, alignment patterns and version info.
+
+    :param version: The QR code version.
+
+    :return: A boolean matrix, True for function modules.
+    """
+    size = qr_module_count(version)
+    function = np.zeros((size, size), dtype=bool)
+    function[:9, :9] = True
+    function[:9, size - 8:] = True
+    function[size - 8:, :9] = True
+    function[6, :] = True
+    function[:, 6] = True
+
+    # Alignment patterns are left out where they would overlap a finder pattern
+    positions = util.pattern_position(version)
+    for row in positions:
+        for col in positions:
+            if (row < 9 and col < 9) or (row < 9 and col >= size - 8) or (row >= size - 8 and col < 9):
+                continue
+            function[row - 2:row + 3, col - 2:col + 3] = True
+
+    if version >= 7:
+        function[size - 11:size - 8, :6] = True
+        function[:6, size - 11:size - 8] = True
+    return function
+
+
+def get_data_positions(function):
+    """
+    Get the data modules in the order their bits were placed
+    (two columns at a time from the right, alternating up and down).
+
+    :param function: The function modules (see `get_function_modules`).
+
+    :return: The rows and the columns of the data modules.
+    """
+    size = len(function)
+    rows = []
+    cols = []
+    upward = True
+    for right in range(size - 1, 0, -2):
+        # The vertical timing pattern is skipped
+        if right <= 6:
+            right -= 1
+        for step in range(size):
+            row = size - 1 - step if upward else step
+            for col in (right, right - 1):
+                if not function[row, col]:
+                    rows.append(row)
+                    cols.append(col)
+        upward = not upward
+    return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+
+def read_format(modules):
+    """
+    Read the error correction level and the mask from the format info.
+    Both copies are read, the one closest to a valid code word is used.
+
+    :param modules: The module matrix (True = black).
+
+    :return: The error correction level and the mask pattern, or None if the format info is unreadable.
+    """
+    size = len(modules)
+    vertical = 0
+    horizontal = 0
+    # Positions as written by `qrcode.main.QRCode.setup_type_info`
+    for i in range(15):
+        if i < 6:
+            vertical |= int(modules[i, 8]) << i
+        elif i < 8:
+            vertical |= int(modules[i + 1, 8]) << i
+        else:
+            vertical |= int(modules[size - 15 + i, 8]) << i
+
+        if i < 8:
+            horizontal |= int(modules[8, size - i - 1]) << i
+        elif i < 9:
+            horizontal |= int(modules[8, 7]) << i
+        else:
+            horizontal |= int(modules[8, 14 - i]) << i
+
+    distance, data = min(
+        (min(bin(code ^ vertical).count("1"), bin(code ^ horizontal).count("1")), data)
+        for code, data in FORMAT_CODES.items()
+    )
+    if distance > FORMAT_ERRORS:
+        return None
+    return data >> 3, data & 7
+
+
+def rs_syndromes(codewords, ec_count):
+    """
+    Calculate the syndromes of a Reed-Solomon block. QR codes use the roots
+    α^0 … α^(ec_count - 1), the first codeword is the highest power.
+
+    :param codewords: The data and error correction codewords (uint8 array).
+    :param ec_count: The amount of error correction codewords.
+
+    :return: The syndromes, all zero if the block has no errors.
+    """
+    powers = np.arange(len(codewords) - 1, -1, -1)
+    exponents = (np.arange(ec_count)[:, None] * powers[None, :] + GF_LOG[codewords][None, :]) % 255
+    terms = GF_EXP[exponents]
+    terms[:, codewords == 0] = 0
+    return [int(syndrome) for syndrome in np.bitwise_xor.reduce(terms, axis=1)]
+
+
+def poly_eval(poly, x):
+    """
+    Evaluate a polynomial over GF(2^8).
+
+    :param poly: The coefficients, lowest power first.
+    :param x: The point.
+
+    :return: The value.
+    """
+    value = 0
+    for coefficient in reversed(poly):
+        value = gf_mul(value, x) ^ coefficient
+    return value
+
+
+def rs_correct(codewords, ec_count):
+    """
+    Correct the errors of a Reed-Solomon block (Berlekamp-Massey, Chien search and Forney).
+
+    :param codewords: The data and error correction codewords (uint8 array).
+    :param ec_count: The amount of error correction codewords.
+
+    :return: The corrected codewords, or None if the block has too many errors.
+    """
+    syndromes = rs_syndromes(codewords, ec_count)
+    if not any(syndromes):
+        return codewords
+
+    # Error locator Λ(x), with Λ(X^-1) = 0 for every error location X
+    locator = [1]
+    previous = [1]
+    errors = 0
+    shift = 1
+    last_discrepancy = 1
+    for n in range(ec_count):
+        discrepancy = syndromes[n]
+        for i in range(1, errors + 1):
+            if i < len(locator):
+                discrepancy ^= gf_mul(locator[i], syndromes[n - i])
+        if discrepancy == 0:
+            shift += 1
+            continue
+
+        scale = gf_mul(discrepancy, gf_inv(last_discrepancy))
+        updated = locator + [0] * max(0, len(previous) + shift - len(locator))
+        for i, coefficient in enumerate(previous):
+            updated[i + shift] ^= gf_mul(scale, coefficient)
+        if 2 * errors <= n:
+            previous = locator
+            errors = n + 1 - errors
+            last_discrepancy = discrepancy
+            shift = 1
+        else:
+            shift += 1
+        locator = updated
+
+    if 2 * errors > ec_count:
+        return None
+
+    # Chien search, the codeword at index k is the power len - 1 - k
+    length = len(codewords)
+    positions = [
+        power for power in range(length)
+        if poly_eval(locator, int(GF_EXP[(255 - power) % 255])) == 0
+    ]
+    if len(positions) != errors:
+        return None
+
+    # Forney, Ω(x) = S(x) Λ(x) mod x^ec_count, with the first root α^0
+    evaluator = [0] * ec_count
+    for i, syndrome in enumerate(syndromes):
+        for j, coefficient in enumerate(locator[:ec_count - i]):
+            evaluator[i + j] ^= gf_mul(syndrome, coefficient)
+    derivative = [coefficient if i % 2 == 0 else 0 for i, coefficient in enumerate(locator[1:])]
+
+    corrected = codewords.copy()
+    for power in positions:
+        location = int(GF_EXP[power])
+        inverse = int(GF_EXP[(255 - power) % 255])
+        denominator = poly_eval(derivative, inverse)
+        if denominator == 0:
+            return None
+        corrected[length - 1 - power] ^= gf_mul(location, gf_mul(poly_eval(evaluator, inverse), gf_inv(denominator)))
+
+    if any(rs_syndromes(corrected, ec_count)):
+        return None
+    return corrected
+
+
+class BitReader:
+    """
+    Reads big-endian bit fields from a string of bits.
+    """
+
+    def __init__(self, data):
+        """
+        :param data: The bytes to read.
+        """
+        self.bits = "".join(format(byte, "08b") for byte in data)
+        self.position = 0
+
+    def remaining(self):
+        """
+        Get the amount of bits left.
+
+        :return: The amount of bits.
+        """
+        return len(self.bits) - self.position
+
+    def read(self, count):
+        """
+        Read a bit field.
+
+        :param count: The amount of bits.
+
+        :return: The value.
+        """
+        if count > self.remaining():
+            raise ValueError("Read past the end of the QR code data")
+        value = int(self.bits[self.position:self.position + count] or "0", 2)
+        self.position += count
+        return value
+
+
+def parse_segments(data, version):
+    """
+    Parse the segments (numeric, alphanumeric and byte mode) of the decoded data.
+
+    :param data: The data codewords.
+    :param version: The QR code version.
+
+    :return: The text, or None if the data is malformed.
+    """
+    reader = BitReader(data)
+    text = []
+    try:
+        while reader.remaining() >= 4:
+            mode = reader.read(4)
+            if mode == 0:
+                break
+            if mode not in (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE):
+                return None
+            count = reader.read(util.length_in_bits(mode, version))
+
+            if mode == util.MODE_8BIT_BYTE:
+                value = reader.read(8 * count)
+                text.append(value.to_bytes(count, "big").decode("utf-8"))
+            elif mode == util.MODE_ALPHA_NUM:
+                for _ in range(count // 2):
+                    first, second = divmod(reader.read(11), 45)
+                    text.append(ALPHANUMERIC[first] + ALPHANUMERIC[second])
+                if count % 2:
+                    text.append(ALPHANUMERIC[reader.read(6)])
+            else:
+                for digits in [3] * (count // 3) + [count % 3] * (count % 3 > 0):
+                    value = reader.read(3 * digits + 1)
+                    if value >= 10 ** digits:
+                        return None
+                    text.append("{:0{}d}".format(value, digits))
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+    return "".join(text)
+
+
+class QRMatrixDecoder:
+    """
+    Decodes the module matrix of a QR code, without looking for it in an image.
+    The layout of a version is calculated once, decoding a matrix is then a
+    handful of array operations and the Reed-Solomon correction of every block.
+    """
+
+    def __init__(self, version):
+        """
+        :param version: The QR code version.
+        """
+        self.version = version
+        self.rows, self.cols = get_data_positions(get_function_modules(version))
+        self.masks = [mask(self.rows, self.cols) for mask in MASKS]
+        self.blocks = {}
+
+    def get_blocks(self, error_correction):
+        """
+        Get the positions of the codewords of every Reed-Solomon block
+        in the interleaved codeword sequence.
+
+        :param error_correction: The error correction level (as in `qrcode.constants`).
+
+        :return: A list of (codeword indexes, error correction codeword count, data codeword count) tuples.
+        """
+        if error_correction not in self.blocks:
+            layout = rs_blocks(self.version, error_correction)
+            indexes = [[] for _ in layout]
+
+            # Data codewords are interleaved first, then the error correction codewords
+            position = 0
+            for i in range(max(block.data_count for block in layout)):
+                for block, block_indexes in zip(layout, indexes):
+                    if i < block.data_count:
+                        block_indexes.append(position)
+                        position += 1
+            for i in range(max(block.total_count - block.data_count for block in layout)):
+                for block, block_indexes in zip(layout, indexes):
+                    if i < block.total_count - block.data_count:
+                        block_indexes.append(position)
+                        position += 1
+
+            self.blocks[error_correction] = [
+                (np.array(block_indexes, dtype=np.intp), block.total_count - block.data_count, block.data_count)
+                for block, block_indexes in zip(layout, indexes)
+            ]
+        return self.blocks[error_correction]
+
+    def decode(self, modules):
+        """
+        Decode a module matrix.
+
+        :param modules: The module matrix (True = black).
+
+        :return: The text of the QR code, or None if it could not be decoded.
+        """
+        code_format = read_format(modules)
+        if code_format is None:
+            return None
+        error_correction, mask = code_format
+
+        bits = modules[self.rows, self.cols] ^ self.masks[mask]
+        blocks = self.get_blocks(error_correction)
+        codeword_count = sum(len(indexes) for indexes, _, _ in blocks)
+        codewords = np.packbits(bits[:codeword_count * 8])
+
+        data = []
+        for indexes, ec_count, data_count in blocks:
+            block = rs_correct(codewords[indexes], ec_count)
+            if block is None:
+                return None
+            data.append(block[:data_count])
+        return parse_segments(np.concatenate(data).tobytes(), self.version)
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+from qr_matrix import QRMatrixDecoder, qr_module_count
+
+# Quiet zone around every QR code, in modules (see `file2video.create_qr`)
+QR_BORDER = 4
+
+
+def get_qr_layout(meta_data):
+    """
+    Get the position of every QR code in a data frame, from the metadata.
+    Mirrors `Encoder.create_frame` and `Encoder.create_tiled_frame`.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: A list of (left, top, width, height) tuples, in chunk order.
+    """
+    width = meta_data.get("Width", 1080)
+    height = meta_data.get("Height", 1080)
+    if meta_data.get("Codec", "qr") != "qr-tiled":
+        return [(0, 0, width, height)]
+
+    tile_rows = meta_data["TileRows"]
+    tile_cols = meta_data["TileCols"]
+    tile_width = width // tile_cols
+    tile_height = height // tile_rows
+    tile_dim = min(tile_width, tile_height)
+
+    layout = []
+    for row in range(tile_rows):
+        for col in range(tile_cols):
+            top = row * tile_height + (tile_height - tile_dim) // 2
+            left = col * tile_width + (tile_width - tile_dim) // 2
+            layout.append((left, top, tile_dim, tile_dim))
+    return layout
+
+
+class QRSampler:
+    """
+    Reads QR codes at known positions. The module centers are calculated once,
+    every frame is then read by sampling them and decoding the module matrix
+    directly (see `qr_matrix`), no barcode library searches the frame.
+    """
+
+    def __init__(self, meta_data):
+        """
+        Calculate the module centers of every QR code in a data frame.
+
+        :param meta_data: The metadata from the first frame (needs `QRVersion`).
+        """
+        modules = qr_module_count(meta_data["QRVersion"])
+        pixels = modules + 2 * QR_BORDER
+
+        # Center of every module in the unscaled QR image, before `cv2.resize`
+        centers = QR_BORDER + np.arange(modules) + 0.5
+
+        layout = get_qr_layout(meta_data)
+        self.positions = []
+        for left, top, width, height in layout:
+            xs = np.floor(left + centers * width / pixels).astype(np.intp)
+            ys = np.floor(top + centers * height / pixels).astype(np.intp)
+            self.positions.append((ys, xs))
+
+        # Average a patch around every center, the edges of modules get smeared by compression
+        pitch = min(min(width, height) for _, _, width, height in layout) / pixels
+        self.blur_size = max(1, int(pitch / 2))
+        self.matrix_decoder = QRMatrixDecoder(meta_data["QRVersion"])
+
+    def sample_modules(self, gray, ys, xs):
+        """
+        Sample the modules of a single QR code.
+
+        :param gray: The frame (grayscale, blurred).
+        :param ys: The module center rows.
+        :param xs: The module center columns.
+
+        :return: The module matrix (True = black).
+        """
+        samples = gray[ys[:, None], xs[None, :]]
+        _, modules = cv2.threshold(samples, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        return modules.astype(bool)
+
+    def read(self, frame):
+        """
+        Read every QR code of a data frame.
+
+        :param frame: The frame, cropped to the data area (see `video2file.crop_frame`).
+
+        :return: The data of every QR code in chunk order, None where a code could not be read.
+        """
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.blur(gray, (self.blur_size, self.blur_size))
+
+        results = []
+        for ys, xs in self.positions:
+            results.append(self.matrix_decoder.decode(self.sample_modules(gray, ys, xs)))
+        return results
@@ -0,0 +1,315 @@
+import os
+import cv2
+import time
+import shutil
+import tempfile
+import subprocess
+
+from termcolor import colored
+from prettytable import PrettyTable
+from config import get_verbose, get_codec, update_config
+from barcode import get_available_backends, set_backend
+from file2video import Encoder
+from video2file import Decoder, get_frame_count, get_stream_chunk_count
+from video_writer import CANVAS_WIDTH, CANVAS_HEIGHT, get_ffmpeg_exe
+
+VERBOSE = get_verbose()
+
+# Renditions YouTube serves after transcoding (name, width, height, bitrate at 30 fps).
+# A setting has to survive all of them, the restore path downloads the 720p stream.
+LADDER = [
+    ("1080p", 1920, 1080, 4000),
+    ("720p", 1280, 720, 2000),
+]
+
+# YouTube gives high frame rate renditions roughly 1.5 times the bitrate
+HIGH_FRAME_RATE_BITRATE = 1.5
+
+# Amount of data frames encoded per setting
+SAMPLE_FRAMES = 60
+
+# Settings that lose more chunks than this are not considered reliable
+MAX_ERROR_RATE = 0.0
+
+# Data frames decoded per barcode backend by `bench_decoders`
+BENCH_FRAMES = 30
+
+# Config keys of the `Encoder` arguments that are named differently
+CONFIG_KEYS = {"width": "frame_width", "height": "frame_height"}
+
+# Settings tried by `tune`, every entry is passed to `Encoder`
+SETTINGS = (
+    [
+        {"codec": "qr", "chunk_size": chunk_size, "frame_rate": frame_rate}
+        for chunk_size in (250, 500, 1000)
+        for frame_rate in (20.0, 30.0, 60.0)
+    ]
+    + [
+        {"codec": "qr-tiled", "tile_rows": tiles, "tile_cols": tiles, "chunk_size": 250, "frame_rate": frame_rate}
+        for tiles in (2, 3)
+        for frame_rate in (20.0, 30.0, 60.0)
+    ]
+    + [
+        {"codec": "grid", "cell_size": cell_size, "width": width, "height": 1080, "frame_rate": frame_rate}
+        for cell_size in (4, 6, 8, 12)
+        for width in (1080, 1920)
+        for frame_rate in (20.0, 30.0, 60.0)
+    ]
+)
+
+
+def transcode(src, dest, rung, frame_rate):
+    """
+    Transcode a video the way YouTube does: center it on the canvas, scale it
+    to the rendition size and re-encode it with a capped H.264 bitrate (faststart).
+
+    :param src: The video path.
+    :param dest: The output file path.
+    :param rung: The rendition (name, width, height, bitrate in kbit/s).
+    :param frame_rate: The frame rate of the video.
+
+    :return: None
+    """
+    _, width, height, bitrate = rung
+    if frame_rate > 30:
+        bitrate = int(bitrate * HIGH_FRAME_RATE_BITRATE)
+    filters = ",".join(
+        [
+            f"pad={CANVAS_WIDTH}:{CANVAS_HEIGHT}:(ow-iw)/2:(oh-ih)/2:black",
+            f"scale={width}:{height}",
+        ]
+    )
+    command = [
+        get_ffmpeg_exe(),
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        src,
+        "-vf",
+        filters,
+        "-c:v",
+        "libx264",
+        "-preset",
+        "fast",
+        "-b:v",
+        f"{bitrate}k",
+        "-maxrate",
+        f"{bitrate}k",
+        "-bufsize",
+        f"{bitrate * 2}k",
+        "-pix_fmt",
+        "yuv420p",
+        # YouTube serves progressive MP4s with the moov atom first, stream restores need it
+        "-movflags",
+        "+faststart",
+        dest,
+    ]
+    if subprocess.run(command).returncode != 0:
+        raise Exception(f"Cannot transcode {src} to {rung[0]}")
+
+
+def measure_error_rate(video_path):
+    """
+    Decode a video and count the chunks that could not be read.
+
+    :param video_path: The video path.
+
+    :return: The share of lost chunks (1 if the first frame can't be read).
+    """
+    cap = cv2.VideoCapture(video_path)
+    decoder = Decoder()
+    try:
+        if not decoder.read_header(cap):
+            return 1.0
+
+        read = set()
+        for frame_index in range(get_frame_count(decoder.meta_data)):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            for stream_index, _ in decoder.read_chunks(frame, frame_index):
+                read.add(stream_index)
+
+        stream_count = get_stream_chunk_count(decoder.meta_data)
+        return 1 - len(read) / stream_count
+    finally:
+        cap.release()
+
+
+def evaluate(settings, work_dir):
+    """
+    Encode a random payload with a setting, run it through the transcoding
+    ladder and decode every rendition.
+
+    :param settings: The `Encoder` arguments.
+    :param work_dir: The directory for temporary files.
+
+    :return: The throughput (bytes per second of video) and the worst error rate.
+    """
+    # Raw error rate: no parity chunks, no compression (random data wouldn't compress anyway)
+    encoder = Encoder(video_writer="opencv", fec_parity_chunks=0, compression="none", **settings)
+
+    payload_path = os.path.join(work_dir, "payload.bin")
+    payload_size = encoder.get_payload_size() * encoder.get_pieces_per_frame() * SAMPLE_FRAMES
+    with open(payload_path, "wb") as payload:
+        payload.write(os.urandom(payload_size))
+
+    video_path = os.path.join(work_dir, "encoded.mp4")
+    encoder.convert(payload_path, video_path)
+
+    frame_count = get_frame_count(encoder.meta_data)
+    throughput = payload_size / (frame_count / encoder.frame_rate)
+
+    error_rate = 0.0
+    for rung in LADDER:
+        rung_path = os.path.join(work_dir, f"{rung[0]}.mp4")
+        transcode(video_path, rung_path, rung, encoder.frame_rate)
+        error_rate = max(error_rate, measure_error_rate(rung_path))
+        if error_rate > MAX_ERROR_RATE:
+            break
+
+    return throughput, error_rate
+
+
+def tune(settings=SETTINGS, save=True):
+    """
+    Find the fastest encoder settings that survive YouTube's transcoding,
+    by simulating it locally with ffmpeg. Nothing gets uploaded.
+
+    :param settings: The settings to try.
+    :param save: Whether to write the best setting to the config file.
+
+    :return: The best setting, or None if no setting was reliable.
+    """
+    work_dir = tempfile.mkdtemp(prefix="yousync-tune-")
+    results = []
+    try:
+        for index, setting in enumerate(settings):
+            if VERBOSE:
+                print(colored(f"[+] Trying setting {index + 1}/{len(settings)}: {setting}", "light_cyan"))
+            start = time.time()
+            throughput, error_rate = evaluate(setting, work_dir)
+            results.append((setting, throughput, error_rate, time.time() - start))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    table = PrettyTable()
+    table.field_names = ["Setting", "Throughput (KB/s of video)", "Error Rate", "Time (s)"]
+    for setting, throughput, error_rate, elapsed in sorted(results, key=lambda result: -result[1]):
+        table.add_row([setting, round(throughput / 1000, 1), f"{error_rate:.2%}", round(elapsed, 1)])
+    print(table)
+
+    reliable = [result for result in results if result[2] <= MAX_ERROR_RATE]
+    if not reliable:
+        print(colored("[-] No setting decoded reliably, keeping the current config.", "red"))
+        return None
+
+    best = max(reliable, key=lambda result: result[1])[0]
+    print(colored(f"[+] Fastest reliable setting: {best}", "light_green"))
+
+    if save:
+        update_config({CONFIG_KEYS.get(key, key): value for key, value in best.items()})
+        print(colored("[+] Saved the setting to config.json.", "light_green"))
+    return best
+
+
+def time_backend(name, video_path):
+    """
+    Decode a video with a barcode backend and time the data frames.
+
+    :param name: The backend name.
+    :param video_path: The video path.
+
+    :return: The frames decoded per second and the error rate (1 if the first frame can't be read).
+    """
+    set_backend(name)
+    cap = cv2.VideoCapture(video_path)
+    decoder = Decoder(decode_workers=1)
+    try:
+        if not decoder.read_header(cap):
+            return 0.0, 1.0
+        # The QR sampler doesn't use a barcode backend, every frame has to go through the backend
+        decoder.qr_sampler = None
+
+        read = set()
+        elapsed = 0.0
+        frame_count = get_frame_count(decoder.meta_data)
+        for frame_index in range(frame_count):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Only the barcode reading is timed, not the video decoding
+            start = time.perf_counter()
+            chunks = decoder.read_chunks(frame, frame_index)
+            elapsed += time.perf_counter() - start
+            for stream_index, _ in chunks:
+                read.add(stream_index)
+
+        error_rate = 1 - len(read) / get_stream_chunk_count(decoder.meta_data)
+        return frame_count / max(elapsed, 1e-9), error_rate
+    finally:
+        cap.release()
+        set_backend(None)
+
+
+def bench_decoders(save=True):
+    """
+    Time every barcode backend installed on this machine on frames that went
+    through YouTube's transcoding (simulated with ffmpeg), and pick the fastest
+    one that reads all of them.
+
+    :param save: Whether to write the best backend to the config file.
+
+    :return: The best backend, or None if no backend read every frame.
+    """
+    # The grid codec only uses barcodes for the first frame, benchmark the QR codec instead
+    codec = get_codec()
+    encoder = Encoder(
+        codec=codec if codec != "grid" else "qr",
+        video_writer="opencv",
+        fec_parity_chunks=0,
+        compression="none",
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="yousync-bench-")
+    results = []
+    try:
+        payload_path = os.path.join(work_dir, "payload.bin")
+        with open(payload_path, "wb") as payload:
+            payload.write(os.urandom(encoder.get_payload_size() * encoder.get_pieces_per_frame() * BENCH_FRAMES))
+
+        video_path = os.path.join(work_dir, "encoded.mp4")
+        encoder.convert(payload_path, video_path)
+
+        # The restore path downloads the lowest rendition
+        rung = LADDER[-1]
+        rung_path = os.path.join(work_dir, f"{rung[0]}.mp4")
+        transcode(video_path, rung_path, rung, encoder.frame_rate)
+
+        for name in get_available_backends():
+            if VERBOSE:
+                print(colored(f"[+] Benchmarking barcode backend: {name}", "light_cyan"))
+            frame_rate, error_rate = time_backend(name, rung_path)
+            results.append((name, frame_rate, error_rate))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    table = PrettyTable()
+    table.field_names = ["Backend", "Frames/s", "Error Rate"]
+    for name, frame_rate, error_rate in sorted(results, key=lambda result: -result[1]):
+        table.add_row([name, round(frame_rate, 1), f"{error_rate:.2%}"])
+    print(table)
+
+    correct = [result for result in results if result[2] <= MAX_ERROR_RATE]
+    if not correct:
+        print(colored("[-] No barcode backend read every frame, keeping the current config.", "red"))
+        return None
+
+    best = max(correct, key=lambda result: result[1])[0]
+    print(colored(f"[+] Fastest barcode backend: {best}", "light_green"))
+
+    if save:
+        update_config({"barcode_backend": best})
+        print(colored("[+] Saved the backend to config.json.", "light_green"))
+    return best
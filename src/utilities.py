@@ -54,9 +54,14 @@ def print_help():
     print("Unlimited File Storage Solution using YouTube\n")
     print("  -h, --help\t\t\tPrint this help message and exit")
     print("  -v, --version\t\t\tPrint version information and exit")
-    print("  -u, --upload\t\t\tUpload a file to Storage")
+    print("  -u, --upload\t\t\tUpload one or more files to Storage")
+    print("  -p, --pack\t\t\tUpload many (small) files to Storage as one video")
     print("  -d, --download\t\tDownload a file from Storage")
+    print("  -dr, --download-range\t\tDownload LENGTH bytes at OFFSET of a file from Storage")
     print("  -l, --list\t\t\tList all files uploaded to Storage")
+    print("  -t, --tune\t\t\tFind the fastest reliable encoder settings (offline)")
+    print("  -b, --benchmark\t\tTime every stage of an upload and restore (offline, emulated)")
+    print("  -bd, --bench-decoders\t\tPick the fastest barcode library on this machine (offline)")
     print("  -ra, --remove-all\t\tRemove all files from Storage")
     print("  -r, --remove\t\t\tRemove a file from Storage")
     print("  -s, --search\t\t\tSearch for a file")
@@ -1,71 +1,944 @@
 import os
 import cv2
 import json
+import math
 import base64
-import hashlib
+import queue
+import binascii
+import threading
 
 from tqdm import tqdm
-from pyzbar import pyzbar
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from config import get_decode_workers
+from pixel_grid import GRID_VERSION, decode_grid_frame
+from envelope import ENVELOPE_VERSION, unwrap_chunk
+from fec import chunk_slot, locate_chunk, recover_chunks, slot_chunk, slot_count, stream_chunk_count
+from compression import DecompressingWriter
+from qr_sampler import QRSampler
+from barcode import decode_barcodes
+from preprocess import FramePreprocessor
+from integrity import MerkleTree, buffer_checksum, file_checksum
+from mapped_file import MappedFile
 
+# Size of the pieces decompressed at once after a parallel decode
+DECOMPRESS_SIZE = 1024 * 1024
 
-def checksum(large_file):
-    md5_object = hashlib.md5()
-    block_size = 128 * md5_object.block_size
-    a_file = open(large_file, 'rb')
-    chunk = a_file.read(block_size)
-    while chunk:
-        md5_object.update(chunk)
-        chunk = a_file.read(block_size)
-    md5_hash = md5_object.hexdigest()
+# Times a seek gets corrected before reading on from wherever it landed
+SEEK_ATTEMPTS = 3
 
-    return md5_hash
+# Frames in a row the QR sampler may fail on before a decoder stops using it
+SAMPLER_FAILURES = 8
 
 
-def read_the_barc(frame):
-    barcodes = pyzbar.decode(frame)
-    for barcode in barcodes:
-        barcode_info = barcode.data.decode('utf-8')
+def read_the_barc(frame, preprocessor=None):
+    for barcode_info in read_all_barcs(frame, preprocessor):
         return True, barcode_info
     return False, 0
 
-def read_vid():
-    cap = cv2.VideoCapture(src)
-    cap.release()
-    ret, first_frame = cap.read()
-    res, retval = read_the_barc(first_frame)
-    if not res:
-        print("Cannot read first frame QR")
-        return
-    meta_data = json.loads(retval)
-
-    dest = os.path.join(dest_folder, meta_data["Filename"])
-    file = open(dest, "wb")
-
-    pbar = tqdm(total=meta_data["ChunkCount"])
-    while(cap.isOpened()):
-        ret, frame = cap.read()
-        if ret:
-            res, retval = read_the_barc(frame)
-            assert res
-            file.write(base64.b64decode(retval))
-            pbar.update(1)
-        else:
+def read_all_barcs(frame, preprocessor=None, expected=1):
+    """
+    Read every QR code in a frame. With a preprocessor, the frame is retried
+    with its filters until `expected` codes were found.
+
+    :param frame: The frame.
+    :param preprocessor: The preprocessor (see `preprocess.FramePreprocessor`), or None to read the frame as is.
+    :param expected: The amount of QR codes in the frame.
+
+    :return: The data of all QR codes found.
+    """
+    if preprocessor is None:
+        return decode_barcodes(frame)
+
+    found = {}
+    for image in preprocessor.candidates(frame):
+        for barcode_info in decode_barcodes(image):
+            found.setdefault(barcode_info, None)
+        if len(found) >= expected:
             break
+    return list(found)
+
+def get_pieces_per_frame(meta_data):
+    """
+    Get the amount of chunks stored in a single frame.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of chunks.
+    """
+    if meta_data.get("Codec", "qr") == "qr-tiled":
+        return meta_data["TileRows"] * meta_data["TileCols"]
+    return 1
+
+def get_fec_layout(meta_data):
+    """
+    Get the error correction layout. Without parity chunks every chunk is its own group.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of data chunks and parity chunks per group.
+    """
+    return meta_data.get("FecDataChunks", 1), meta_data.get("FecParityChunks", 0)
+
+def get_stream_chunk_count(meta_data):
+    """
+    Get the amount of chunks (data and parity) stored in a video.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of chunks.
+    """
+    return stream_chunk_count(meta_data["ChunkCount"], *get_fec_layout(meta_data))
+
+def get_interleave(meta_data):
+    """
+    Get the amount of error correction groups interleaved across frames (see `fec.chunk_slot`).
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of groups, 1 if the groups follow one after another.
+    """
+    return meta_data.get("FecInterleave", 1)
+
+def get_slot_count(meta_data):
+    """
+    Get the amount of frame slots of a video, including the empty ones.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of slots.
+    """
+    return slot_count(meta_data["ChunkCount"], *get_fec_layout(meta_data), get_interleave(meta_data))
+
+def get_frame_count(meta_data):
+    """
+    Get the amount of data frames in a video.
+
+    :param meta_data: The metadata from the first frame.
+
+    :return: The amount of data frames.
+    """
+    return math.ceil(get_slot_count(meta_data) / get_pieces_per_frame(meta_data))
+
+def get_frame_chunks(meta_data, frame_index):
+    """
+    Get the chunks stored in a data frame.
+
+    :param meta_data: The metadata from the first frame.
+    :param frame_index: The index of the frame (not counting the first frame).
+
+    :return: The stream index of the chunk in every slot of the frame, None for empty slots.
+    """
+    pieces_per_frame = get_pieces_per_frame(meta_data)
+    first_slot = frame_index * pieces_per_frame
+    last_slot = min(first_slot + pieces_per_frame, get_slot_count(meta_data))
+    return [
+        slot_chunk(slot, meta_data["ChunkCount"], *get_fec_layout(meta_data), get_interleave(meta_data))
+        for slot in range(first_slot, last_slot)
+    ]
+
+def get_chunk_frame(meta_data, stream_index):
+    """
+    Find the data frame holding a chunk.
+
+    :param meta_data: The metadata from the first frame.
+    :param stream_index: The index of the chunk in the stream.
+
+    :return: The index of the frame (not counting the first frame).
+    """
+    slot = chunk_slot(stream_index, *get_fec_layout(meta_data), get_interleave(meta_data))
+    return slot // get_pieces_per_frame(meta_data)
+
+def get_group_frames(meta_data, first_group, last_group=None):
+    """
+    Find the data frames holding error correction groups.
+
+    :param meta_data: The metadata from the first frame.
+    :param first_group: The first group.
+    :param last_group: The last group, only the first group if not set.
+
+    :return: The first and the last frame (not counting the first frame).
+    """
+    if last_group is None:
+        last_group = first_group
+    data_count, parity_count = get_fec_layout(meta_data)
+    group_size = data_count + parity_count
+    stream_count = get_stream_chunk_count(meta_data)
+
+    # Interleaved groups of a block share their frames, the last group of a video can be short
+    groups = range(max(first_group, last_group - get_interleave(meta_data) + 1), last_group + 1)
+    last_frame = max(get_chunk_frame(meta_data, min((group + 1) * group_size, stream_count) - 1) for group in groups)
+    return get_chunk_frame(meta_data, first_group * group_size), last_frame
+
+def get_frame_range(meta_data, offset, length):
+    """
+    Find the frames holding a byte range of the encoded data.
+    Frame 0 is the first frame (metadata). Only valid for uncompressed videos.
+
+    :param meta_data: The metadata from the first frame.
+    :param offset: The offset of the range.
+    :param length: The length of the range.
+
+    :return: The first and last frame holding the range.
+    """
+    data_count, parity_count = get_fec_layout(meta_data)
+    chunk_size = meta_data["ChunkSize"]
+    first_chunk = offset // chunk_size
+    last_chunk = (offset + max(length, 1) - 1) // chunk_size
+
+    # Interleaved chunks aren't in order, take every frame of their groups
+    if get_interleave(meta_data) > 1:
+        first_frame, last_frame = get_group_frames(meta_data, first_chunk // data_count, last_chunk // data_count)
+        return first_frame + 1, last_frame + 1
+
+    def frame_of(chunk_index):
+        group, position = divmod(chunk_index, data_count)
+        return get_chunk_frame(meta_data, group * (data_count + parity_count) + position) + 1
+
+    return frame_of(first_chunk), frame_of(last_chunk)
+
+def decode_tiled_frame(frame, meta_data, preprocessor=None):
+    """
+    Decode a frame holding a grid of indexed QR codes.
 
-    pbar.close()
-    file.close()
+    :param frame: The frame.
+    :param meta_data: The metadata from the first frame.
+    :param preprocessor: The preprocessor, or None to read the frame as is.
 
-    md5_sum = checksum(dest)
-    if md5_sum != meta_data["Filehash"]:
-        return False
-    else:
+    :return: The pieces in chunk order, or None if no QR code could be read.
+    """
+    pieces = {}
+    for barcode_info in read_all_barcs(frame, preprocessor, get_pieces_per_frame(meta_data)):
+        index, _, data = barcode_info.partition(":")
+        pieces[int(index)] = base64.b64decode(data)
+    if not pieces:
+        return None
+
+    # Without an envelope, chunks can only be placed if the frame is complete
+    if not meta_data.get("Envelope"):
+        pieces_per_frame = get_pieces_per_frame(meta_data)
+        first_index = min(pieces)
+        expected = min(pieces_per_frame, get_stream_chunk_count(meta_data) - first_index)
+        if first_index % pieces_per_frame != 0 or sorted(pieces) != list(range(first_index, first_index + expected)):
+            return None
+
+    return [pieces[index] for index in sorted(pieces)]
+
+def crop_frame(frame, meta_data):
+    """
+    Cut the data area out of a frame and scale it back to its original size.
+    The data area stays centered when the video gets padded (see `yt.prep_video`).
+
+    :param frame: The frame.
+    :param meta_data: The metadata from the first frame.
+
+    :return: The cropped frame.
+    """
+    width = meta_data.get("Width", 1080)
+    height = meta_data.get("Height", 1080)
+    frame_height, frame_width = frame.shape[:2]
+    if (frame_width, frame_height) == (width, height):
+        return frame
+
+    scale = min(frame_width / width, frame_height / height)
+    area_width = round(width * scale)
+    area_height = round(height * scale)
+    left = (frame_width - area_width) // 2
+    top = (frame_height - area_height) // 2
+    frame = frame[top:top + area_height, left:left + area_width]
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def decode_frame(frame, meta_data, preprocessor=None):
+    """
+    Decode the payload of a data frame, using the codec from the metadata.
+
+    :param frame: The frame.
+    :param meta_data: The metadata from the first frame.
+    :param preprocessor: The preprocessor for QR codes, or None to read the frame as is.
+
+    :return: The pieces stored in the frame, or None if the frame could not be read.
+    """
+    if meta_data.get("Codec", "qr") == "grid":
+        if meta_data["CodecVersion"] > GRID_VERSION:
+            raise Exception("Unsupported grid codec version: {}".format(meta_data["CodecVersion"]))
+        data = decode_grid_frame(crop_frame(frame, meta_data), meta_data["CellSize"])
+        return [data] if data is not None else None
+    if meta_data.get("Codec", "qr") == "qr-tiled":
+        return decode_tiled_frame(frame, meta_data, preprocessor)
+
+    res, retval = read_the_barc(frame, preprocessor)
+    return [base64.b64decode(retval)] if res else None
+
+class Decoder:
+    """
+    Converts videos back to files. Every decoder holds its own state,
+    so multiple conversions can run in the same process (see `convert_videos_to_files`).
+    """
+
+    def __init__(self, decode_workers=None, merkle_root=None):
+        """
+        :param decode_workers: The amount of worker processes, read from the config if not set.
+        :param merkle_root: The expected Merkle root (e.g. from the database), used if the trailer can't be read.
+        """
+        self.decode_workers = get_decode_workers() if decode_workers is None else decode_workers
+        self.decode_workers = self.decode_workers or os.cpu_count()
+        self.merkle_root = merkle_root
+
+        self.meta_data = {}
+        self.qr_sampler = None
+        self.sampler_failures = 0
+        self.tree = None
+        self.checksum = None
+
+        # The first and the last frame hold a single QR code of unknown size
+        self.json_preprocessor = FramePreprocessor()
+        self.preprocessor = self.json_preprocessor
+
+    def read_header(self, cap):
+        """
+        Read the metadata from the first frame.
+
+        :param cap: The video capture.
+
+        :return: True if the metadata could be read, False otherwise.
+        """
+        ret, first_frame = cap.read()
+        if not ret:
+            return False
+        res, retval = read_the_barc(first_frame, self.json_preprocessor)
+        if not res:
+            return False
+        self.meta_data = json.loads(retval)
+        if self.meta_data.get("Envelope", 0) > ENVELOPE_VERSION:
+            raise Exception("Unsupported envelope version: {}".format(self.meta_data["Envelope"]))
+        self.preprocessor = FramePreprocessor(
+            self.meta_data, self.json_preprocessor.steps, self.json_preprocessor.retry_filters
+        )
+
+        # Data frames with a fixed QR version can be read at known module positions
+        if self.meta_data.get("Envelope") and "QRVersion" in self.meta_data:
+            self.qr_sampler = QRSampler(self.meta_data)
+        if "MerkleHash" in self.meta_data:
+            self.tree = MerkleTree(self.meta_data["MerkleHash"])
         return True
 
+    def read_trailer(self, cap):
+        """
+        Read the Merkle root from the frame after the data frames.
+
+        :param cap: The video capture, positioned after the data frames.
+
+        :return: None
+        """
+        ret, frame = cap.read()
+        if not ret:
+            return
+        res, retval = read_the_barc(crop_frame(frame, self.meta_data), self.json_preprocessor)
+        if not res:
+            return
+        try:
+            trailer = json.loads(retval)
+        except ValueError:
+            return
+        if isinstance(trailer, dict) and "MerkleRoot" in trailer:
+            self.merkle_root = trailer["MerkleRoot"]
+
+    def verify(self, dest):
+        """
+        Verify a decoded file. Videos with a Merkle root were hashed while decoding,
+        older videos are checked against the MD5 checksum in their metadata.
+
+        :param dest: The decoded file path.
+
+        :return: True if the file is intact, False if not, None if there is nothing to check against.
+        """
+        if self.tree is not None:
+            if self.merkle_root is None:
+                return None
+            return self.tree.root() == self.merkle_root
+        if "Filehash" in self.meta_data:
+            checksum = self.checksum if self.checksum is not None else file_checksum(dest)
+            return checksum == self.meta_data["Filehash"]
+        return None
+
+    def decode_frame(self, frame):
+        """
+        Decode the payload of a data frame.
+
+        :param frame: The frame.
+
+        :return: The pieces stored in the frame, or None if the frame could not be read.
+        """
+        return decode_frame(frame, self.meta_data, self.preprocessor)
+
+    def read_chunks_fast(self, frame, frame_index):
+        """
+        Read the chunks of a data frame by sampling the QR codes at their known positions.
+
+        :param frame: The frame.
+        :param frame_index: The index of the frame (not counting the first frame).
+
+        :return: A list of (stream index, chunk) tuples, or None if any chunk failed its checksum.
+        """
+        stream_count = get_stream_chunk_count(self.meta_data)
+        slots = get_frame_chunks(self.meta_data, frame_index)
+
+        chunks = []
+        for stream_index, barcode_info in zip(slots, self.qr_sampler.read(crop_frame(frame, self.meta_data))):
+            # Tiles of empty slots are blank
+            if stream_index is None:
+                continue
+            if barcode_info is None:
+                return None
+            if self.meta_data.get("Codec", "qr") == "qr-tiled":
+                barcode_info = barcode_info.partition(":")[2]
+            try:
+                chunk = unwrap_chunk(base64.b64decode(barcode_info))
+            except binascii.Error:
+                return None
+            if chunk is None or chunk[0] >= stream_count:
+                return None
+            chunks.append(chunk)
+        return chunks
+
+    def read_chunks(self, frame, frame_index):
+        """
+        Decode a data frame and verify its chunks. Corrupt chunks are dropped.
+
+        :param frame: The frame.
+        :param frame_index: The index of the frame (not counting the first frame).
+
+        :return: A list of (stream index, chunk) tuples.
+        """
+        chunks, sampled = self.decode_chunks(frame, frame_index)
+        self.track_sampler(sampled)
+        return chunks
+
+    def decode_chunks(self, frame, frame_index):
+        """
+        Decode a data frame and verify its chunks. Frames are read at the known
+        QR code positions first, a full barcode search only runs when that fails.
+        Doesn't change the decoder, so it can run in a worker process.
+
+        :param frame: The frame.
+        :param frame_index: The index of the frame (not counting the first frame).
+
+        :return: The chunks (see `read_chunks`), and whether the sampler read the frame (None if it wasn't used).
+        """
+        sampled = None
+        if self.qr_sampler is not None:
+            chunks = self.read_chunks_fast(frame, frame_index)
+            if chunks is not None:
+                return chunks, True
+            sampled = False
+
+        pieces = self.decode_frame(frame)
+        if pieces is None:
+            return [], sampled
+
+        # Older videos don't carry an envelope, chunks are placed by their position
+        if not self.meta_data.get("Envelope"):
+            first_index = frame_index * get_pieces_per_frame(self.meta_data)
+            return [(first_index + offset, piece) for offset, piece in enumerate(pieces)], sampled
+
+        stream_count = get_stream_chunk_count(self.meta_data)
+        chunks = [unwrap_chunk(piece) for piece in pieces]
+        return [chunk for chunk in chunks if chunk is not None and chunk[0] < stream_count], sampled
+
+    def track_sampler(self, sampled):
+        """
+        Stop using the QR sampler after it failed on `SAMPLER_FAILURES` frames in a row,
+        so a video it can't read (e.g. a heavy transcode) doesn't pay for two decodes per frame.
+
+        :param sampled: Whether the sampler read the last frame (see `decode_chunks`).
+
+        :return: None
+        """
+        if sampled is None:
+            return
+        if sampled:
+            self.sampler_failures = 0
+            return
+        self.sampler_failures += 1
+        if self.sampler_failures >= SAMPLER_FAILURES:
+            self.qr_sampler = None
+
+    def recover_group(self, group, chunks):
+        """
+        Get the data chunks of a group, rebuilding missing ones from parity chunks.
+
+        :param group: The index of the group.
+        :param chunks: The chunks that were read, by position in the group.
+
+        :return: The data chunks.
+        """
+        data_count, parity_count = get_fec_layout(self.meta_data)
+        group_data_count = min(data_count, self.meta_data["ChunkCount"] - group * data_count)
+
+        # Parity is calculated over chunks padded to the same length
+        if parity_count:
+            chunk_size = self.meta_data["ChunkSize"]
+            chunks = {position: chunk.ljust(chunk_size, b"\0") for position, chunk in chunks.items()}
+
+        data = recover_chunks(chunks, data_count, group_data_count)
+        if data is None:
+            raise Exception(
+                "Cannot recover chunk group {}: {} of {} chunks readable".format(group, len(chunks), group_data_count)
+            )
+        return data
+
+    def load_checkpoint(self, journal):
+        """
+        Continue an interrupted decode from its journal.
+
+        :param journal: The journal (see `journal.Journal`), or None.
+
+        :return: The first error correction group that still has to be decoded.
+        """
+        if journal is None or journal.get("chunk_count") != self.meta_data["ChunkCount"]:
+            return 0
+        if self.tree is not None:
+            if journal.get("tree") is None:
+                return 0
+            self.tree.set_state(journal.get("tree"))
+        return journal.get("next_group", 0)
+
+    def save_checkpoint(self, journal, next_group):
+        """
+        Record that every group before `next_group` was decoded, verified and written.
+
+        :param journal: The journal (see `journal.Journal`).
+        :param next_group: The first group that still has to be decoded.
+
+        :return: None
+        """
+        journal.checkpoint(
+            chunk_count=self.meta_data["ChunkCount"],
+            next_group=next_group,
+            tree=self.tree.get_state() if self.tree is not None else None,
+        )
+
+    def skip_to_frame(self, cap, frame_index):
+        """
+        Skip the data frames before a frame, seeking if the capture supports it.
+
+        :param cap: The video capture, positioned after the first frame.
+        :param frame_index: The index of the frame (not counting the first frame).
+
+        :return: The chunks of the frame if it had to be read to check the seek, None otherwise.
+        """
+        if frame_index == 0:
+            return None
+        if hasattr(cap, "set"):
+            return self.seek_frame(cap, frame_index) or []
+        for _ in range(frame_index):
+            cap.grab()
+        return None
+
+    def write_file(self, cap, dest, journal=None):
+        """
+        Decode the data frames and write them to a file.
+
+        :param cap: The video capture, positioned after the first frame.
+        :param dest: The output file path.
+        :param journal: A journal to checkpoint the progress in, and to resume from.
+
+        :return: None
+        """
+        if self.decode_workers > 1 and "FileSize" in self.meta_data:
+            return self.write_file_parallel(cap, dest, journal)
+
+        # The decompressor state can't be saved, compressed videos are decoded in one go
+        if self.meta_data.get("Compression"):
+            journal = None
+
+        chunk_size = self.meta_data["ChunkSize"]
+        chunk_count = self.meta_data["ChunkCount"]
+        data_count, parity_count = get_fec_layout(self.meta_data)
+        group_count = math.ceil(chunk_count / data_count)
+        file_size = self.meta_data.get("FileSize")
+
+        groups = {}
+        next_group = self.load_checkpoint(journal) if os.path.exists(dest) else 0
+        written = next_group * data_count * chunk_size
+        if file_size is not None:
+            written = min(written, file_size)
+
+        # The size of compressed files is only known after decompressing them
+        mapped = file_size is not None and not self.meta_data.get("Compression")
+        if mapped:
+            file = MappedFile(dest, file_size, resume=next_group > 0)
+            file.seek(written)
+        elif next_group:
+            file = open(dest, "r+b")
+            file.truncate(written)
+            file.seek(written)
+        else:
+            file = open(dest, "wb")
+        if self.meta_data.get("Compression"):
+            file = DecompressingWriter(file, self.meta_data["Compression"])
+
+        def flush_group():
+            nonlocal next_group, written
+            for data in self.recover_group(next_group, groups.pop(next_group, {})):
+                # The last chunk may have been padded for the parity calculation
+                if file_size is not None:
+                    data = data[:file_size - written]
+                file.write(data)
+                written += len(data)
+                if self.tree is not None:
+                    self.tree.add(data)
+            next_group += 1
+
+            if journal is not None and journal.due():
+                file.flush()
+                if not mapped:
+                    os.fsync(file.fileno())
+                self.save_checkpoint(journal, next_group)
+
+        # Stop after the data frames, anything after them is padding
+        frame_count = get_frame_count(self.meta_data)
+        start_frame = get_group_frames(self.meta_data, next_group)[0] if next_group < group_count else frame_count
+        chunks = self.skip_to_frame(cap, start_frame)
+
+        pbar = tqdm(total=frame_count, initial=start_frame)
+        for frame_index in range(start_frame, frame_count):
+            if chunks is None:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                chunks = self.read_chunks(frame, frame_index)
+            for stream_index, chunk in chunks:
+                group, position, _ = locate_chunk(stream_index, chunk_count, data_count, parity_count)
+                if group >= next_group:
+                    groups.setdefault(group, {})[position] = chunk
+            chunks = None
+
+            # Write every group whose chunks should all have been read by now
+            while next_group < group_count and get_group_frames(self.meta_data, next_group)[1] <= frame_index:
+                flush_group()
+            pbar.update(1)
+
+        # Groups cut short by the end of the video are not checkpointed, a retry reads them again
+        journal = None
+        while next_group < group_count:
+            flush_group()
+
+        pbar.close()
+        if mapped and self.tree is None and "Filehash" in self.meta_data:
+            self.checksum = buffer_checksum(file.get_buffer())
+        file.close()
+        self.read_trailer(cap)
+
+    def write_file_parallel(self, cap, dest, journal=None):
+        """
+        Decode the data frames in worker processes and write every chunk at its
+        offset in a preallocated file, so frames can finish in any order.
+        A reader thread keeps the workers fed, at most `2 * decode_workers`
+        frames are in flight.
+
+        :param cap: The video capture, positioned after the first frame.
+        :param dest: The output file path.
+        :param journal: A journal to checkpoint the progress in, and to resume from.
+
+        :return: None
+        """
+        compression = self.meta_data.get("Compression")
+        payload_path = dest + ".payload" if compression else dest
+
+        chunk_size = self.meta_data["ChunkSize"]
+        chunk_count = self.meta_data["ChunkCount"]
+        file_size = self.meta_data["FileSize"]
+        data_count, parity_count = get_fec_layout(self.meta_data)
+        group_size = data_count + parity_count
+        group_count = math.ceil(chunk_count / data_count)
+        stream_count = get_stream_chunk_count(self.meta_data)
+        frame_count = get_frame_count(self.meta_data)
+
+        def frames_of(group):
+            first_stream_index = group * group_size
+            last_stream_index = min(first_stream_index + group_size, stream_count)
+            return len({get_chunk_frame(self.meta_data, index) for index in range(first_stream_index, last_stream_index)})
+
+        groups = {}
+        frames_left = {}
+        finished = set()
+
+        # Groups before the checkpoint are already on disk
+        start_group = self.load_checkpoint(journal) if os.path.exists(payload_path) else 0
+
+        # Leaves of written chunks, added to the tree once every chunk before them is final
+        leaves = {}
+        next_leaf = start_group * data_count
+
+        output = MappedFile(payload_path, file_size, resume=start_group > 0)
+        try:
+            def add_leaves():
+                nonlocal next_leaf
+                while next_leaf in leaves and next_leaf // data_count in finished:
+                    leaf = leaves.pop(next_leaf)
+                    if self.tree is not None:
+                        self.tree.add_leaf(leaf)
+                    next_leaf += 1
+
+            def write_chunk(group, position, data):
+                chunk_index = group * data_count + position
+                offset = chunk_index * chunk_size
+                # The last chunk may have been padded for the parity calculation
+                data = data[:file_size - offset]
+                output.write_at(data, offset)
+                leaves[chunk_index] = self.tree.hash_leaf(data) if self.tree is not None else None
+
+            def finish_group(group):
+                chunks = groups.pop(group, {})
+                frames_left.pop(group, None)
+                finished.add(group)
+                group_data_count = min(data_count, chunk_count - group * data_count)
+                if not all(position in chunks for position in range(group_data_count)):
+                    for position, data in enumerate(self.recover_group(group, chunks)):
+                        if position not in chunks:
+                            write_chunk(group, position, data)
+                add_leaves()
+
+                # Every group before the first unfinished one is written and hashed
+                if journal is not None and journal.due():
+                    output.flush()
+                    self.save_checkpoint(journal, next_leaf // data_count)
+
+            def store(frame_index, chunks):
+                for stream_index, chunk in chunks:
+                    group, position, group_data_count = locate_chunk(stream_index, chunk_count, data_count, parity_count)
+                    if group < start_group or group in finished or position in groups.get(group, {}):
+                        continue
+                    groups.setdefault(group, {})[position] = chunk
+                    if position < group_data_count:
+                        write_chunk(group, position, chunk)
+
+                # Groups are complete once every frame holding them was decoded
+                frame_groups = {index // group_size for index in get_frame_chunks(self.meta_data, frame_index) if index is not None}
+                for group in sorted(frame_groups):
+                    if group < start_group:
+                        continue
+                    frames_left[group] = frames_left.get(group, frames_of(group)) - 1
+                    if frames_left[group] == 0:
+                        finish_group(group)
+
+            start_frame = get_group_frames(self.meta_data, start_group)[0] if start_group < group_count else frame_count
+            pbar = tqdm(total=frame_count, initial=start_frame)
+            chunks = self.skip_to_frame(cap, start_frame)
+            if chunks is not None:
+                store(start_frame, chunks)
+                pbar.update(1)
+                start_frame += 1
+
+            frames = queue.Queue(maxsize=2 * self.decode_workers)
+            stop = threading.Event()
+
+            def read_frames():
+                error = None
+                try:
+                    for frame_index in range(start_frame, frame_count):
+                        if stop.is_set():
+                            break
+                        ret, frame = cap.read()
+                        if not ret:
+                            break
+                        # Grayscale frames are a third of the size to send to the workers
+                        frames.put((frame_index, self.preprocessor.capture(frame)))
+                except Exception as e:
+                    error = e
+                finally:
+                    # None ends the main loop, an exception is raised again there
+                    frames.put(error)
+
+            reader = threading.Thread(target=read_frames, daemon=True)
+            reader.start()
+
+            pending = {}
+
+            def collect(futures):
+                for future in futures:
+                    chunks, sampled = future.result()
+                    # Frames submitted from now on are sent without the sampler once it's turned off
+                    self.track_sampler(sampled)
+                    store(pending.pop(future), chunks)
+                    pbar.update(1)
+
+            with ProcessPoolExecutor(max_workers=self.decode_workers) as executor:
+                try:
+                    while True:
+                        item = frames.get()
+                        if item is None:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        frame_index, frame = item
+                        pending[executor.submit(self.decode_chunks, frame, frame_index)] = frame_index
+                        if len(pending) >= 2 * self.decode_workers:
+                            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                            collect(done)
+                    collect(list(pending))
+                finally:
+                    # On an error the reader must be stopped before the capture is released
+                    for future in pending:
+                        future.cancel()
+                    stop.set()
+                    while reader.is_alive():
+                        try:
+                            frames.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+                    reader.join()
+            pbar.close()
+            self.read_trailer(cap)
+
+            # Groups of frames that could not be read at all, not checkpointed so a retry reads them again
+            journal = None
+            for group in range(start_group, group_count):
+                if group not in finished:
+                    finish_group(group)
+
+            # Decompress and hash straight from the mapping instead of reading the file back
+            if compression:
+                file = DecompressingWriter(open(dest, "wb"), compression)
+                for offset in range(0, file_size, DECOMPRESS_SIZE):
+                    file.write(output.read_at(offset, DECOMPRESS_SIZE))
+                file.close()
+            elif self.tree is None and "Filehash" in self.meta_data:
+                self.checksum = buffer_checksum(output.get_buffer())
+        finally:
+            output.close()
+
+        if compression:
+            os.remove(payload_path)
+
+    def seek_frame(self, cap, frame_index):
+        """
+        Seek to a data frame. Seeking in compressed video isn't always frame
+        accurate, so the position is checked against the stream indexes of
+        the chunks in the frame and corrected if needed.
+
+        :param cap: The video capture.
+        :param frame_index: The index of the frame (not counting the first frame).
+
+        :return: The chunks of the frame (see `read_chunks`), or None if the video ended.
+        """
+        requested = frame_index + 1
+        cap.set(cv2.CAP_PROP_POS_FRAMES, requested)
+        for attempt in range(SEEK_ATTEMPTS):
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            chunks = self.read_chunks(frame, frame_index)
+
+            # Without an envelope (or a readable chunk) there is nothing to check against
+            if not self.meta_data.get("Envelope") or not chunks:
+                return chunks
+
+            landed = get_chunk_frame(self.meta_data, chunks[0][0])
+            if landed == frame_index:
+                return chunks
+            if landed < frame_index:
+                for _ in range(frame_index - landed - 1):
+                    cap.grab()
+            else:
+                requested = max(1, requested - (landed - frame_index))
+                cap.set(cv2.CAP_PROP_POS_FRAMES, requested)
+
+        # Keep the chunks, they are placed by their stream index anyway
+        return chunks
+
+    def read_range(self, cap, offset, length):
+        """
+        Decode a byte range without decoding the whole video, by seeking to
+        the error correction groups that hold it.
+
+        :param cap: The video capture.
+        :param offset: The offset of the range.
+        :param length: The length of the range.
+
+        :return: The bytes of the range.
+        """
+        if self.meta_data.get("Compression"):
+            raise Exception("Byte ranges can't be read from compressed videos.")
+
+        chunk_size = self.meta_data["ChunkSize"]
+        chunk_count = self.meta_data["ChunkCount"]
+        data_count, parity_count = get_fec_layout(self.meta_data)
+
+        # Ranges reaching past the end of the file are cut off
+        if "FileSize" in self.meta_data:
+            length = min(length, self.meta_data["FileSize"] - offset)
+        if length <= 0:
+            return b""
+
+        first_group = offset // chunk_size // data_count
+        last_group = (offset + max(length, 1) - 1) // chunk_size // data_count
+
+        # Frame indexes don't count the first frame (metadata)
+        first_frame_index, last_frame_index = get_group_frames(self.meta_data, first_group, last_group)
+
+        groups = {}
+        chunks = self.seek_frame(cap, first_frame_index)
+        for frame_index in range(first_frame_index, last_frame_index + 1):
+            if frame_index > first_frame_index:
+                ret, frame = cap.read()
+                chunks = self.read_chunks(frame, frame_index) if ret else None
+            if chunks is None:
+                break
+            for stream_index, chunk in chunks:
+                group, position, _ = locate_chunk(stream_index, chunk_count, data_count, parity_count)
+                if first_group <= group <= last_group:
+                    groups.setdefault(group, {})[position] = chunk
+
+        data = b"".join(
+            b"".join(self.recover_group(group, groups.get(group, {})))
+            for group in range(first_group, last_group + 1)
+        )
+        start = offset - first_group * data_count * chunk_size
+        return data[start:start + length]
+
+    def convert(self, video_path, dest_folder):
+        """
+        Convert a video to a file.
+
+        :param video_path: The video path.
+        :param dest_folder: The folder to write the file to.
+
+        :return: False if the file failed verification, True otherwise (None if the first frame can't be read).
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not self.read_header(cap):
+                print("Cannot read first frame QR")
+                return
+
+            dest = os.path.join(dest_folder, self.meta_data["Filename"])
+            self.write_file(cap, dest)
+        finally:
+            cap.release()
+
+        return self.verify(dest) is not False
+
 def convert_video_to_file(video_path, file_path):
-    global src
-    global dest_folder
+    """
+    Convert a video to a file.
+
+    :param video_path: The video path.
+    :param file_path: The folder to write the file to.
+
+    :return: True if the checksum matches, False otherwise.
+    """
+    return Decoder().convert(video_path, file_path)
+
+def convert_videos_to_files(jobs, workers=None):
+    """
+    Convert many videos to files concurrently, inside this process.
 
-    src = video_path
-    dest_folder = file_path
+    :param jobs: A list of (video path, output folder) tuples.
+    :param workers: The amount of conversions running at the same time.
 
-    return read_vid()
+    :return: The results of `convert_video_to_file`, in order.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_video_to_file, video_path, file_path) for video_path, file_path in jobs]
+        return [future.result() for future in futures]
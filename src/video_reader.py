@@ -0,0 +1,172 @@
+import threading
+import subprocess
+import numpy as np
+
+from video_writer import CANVAS_WIDTH, CANVAS_HEIGHT, get_ffmpeg_exe
+
+# Seconds `release` waits for the feeding thread, e.g. while it's stuck in a stalled download
+FEEDER_TIMEOUT = 5
+
+# Lines of the ffmpeg log kept to show when it fails
+LOG_LINES = 20
+
+
+class FFmpegReader:
+    """
+    Drop-in replacement for `cv2.VideoCapture` (`read`, `grab` and `release` only) that
+    decodes a video while its bytes are still arriving. The bytes are fed into
+    ffmpeg from a background thread, frames are read back scaled onto the canvas.
+    An error while getting the bytes (e.g. a failed download) is raised again
+    from `read` or `release`, instead of looking like the end of the video.
+    The ffmpeg log is only shown if ffmpeg fails.
+    """
+
+    def __init__(self, pieces, dim=(CANVAS_WIDTH, CANVAS_HEIGHT), gray=False):
+        """
+        Start ffmpeg and the thread feeding it.
+
+        :param pieces: An iterable of bytes (e.g. a download in progress). The video
+            has to be streamable, i.e. the `moov` atom has to come first.
+        :param dim: The frame dimensions (width, height) to read the frames at.
+        :param gray: Whether to read the frames in grayscale instead of BGR, a third of the bytes.
+        """
+        width, height = dim
+        filters = ",".join(
+            [
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black",
+            ]
+        )
+        command = [
+            get_ffmpeg_exe(),
+            "-loglevel",
+            "error",
+            "-i",
+            "pipe:0",
+            "-vf",
+            filters,
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "gray" if gray else "bgr24",
+            "pipe:1",
+        ]
+        self.shape = (height, width) if gray else (height, width, 3)
+        self.frame_size = width * height * (1 if gray else 3)
+        self.closed = False
+        self.error = None
+        self.log = []
+        self.reported = False
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.feeder = threading.Thread(target=self.feed, args=(pieces,), daemon=True)
+        self.feeder.start()
+        self.logger = threading.Thread(target=self.collect_log, daemon=True)
+        self.logger.start()
+
+    def feed(self, pieces):
+        """
+        Write the bytes of the video into ffmpeg, runs in the background thread.
+
+        :param pieces: An iterable of bytes.
+
+        :return: None
+        """
+        try:
+            for piece in pieces:
+                if self.closed:
+                    break
+                try:
+                    self.process.stdin.write(piece)
+                except BrokenPipeError:
+                    # ffmpeg exited, e.g. killed by `release`
+                    break
+        except Exception as e:
+            if not self.closed:
+                self.error = e
+        finally:
+            if hasattr(pieces, "close"):
+                pieces.close()
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def collect_log(self):
+        """
+        Keep the last lines of the ffmpeg log, runs in a background thread.
+        Reading the log also keeps ffmpeg from blocking on a full pipe.
+
+        :return: None
+        """
+        for line in self.process.stderr:
+            self.log.append(line.decode(errors="replace").rstrip())
+            del self.log[:-LOG_LINES]
+
+    def report_failure(self):
+        """
+        Print the ffmpeg log if ffmpeg failed, called at the end of the video. Every failure is reported once.
+
+        :return: None
+        """
+        if self.reported:
+            return
+        try:
+            self.process.wait(FEEDER_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return
+        self.reported = True
+        if self.process.returncode != 0:
+            self.logger.join(FEEDER_TIMEOUT)
+            print(f"[!] ffmpeg exited with code {self.process.returncode}:")
+            print("\n".join(self.log))
+
+    def raise_error(self):
+        """
+        Raise the error of the feeding thread, if there was one. Every error is raised once.
+
+        :return: None
+        """
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def read(self):
+        """
+        Read the next frame.
+
+        :return: True and the frame (BGR or grayscale), or False and None at the end of the video.
+        """
+        data = self.process.stdout.read(self.frame_size)
+        if len(data) < self.frame_size:
+            # The feeding thread stores its error before it closes the input of ffmpeg
+            self.raise_error()
+            self.report_failure()
+            return False, None
+        return True, np.frombuffer(data, dtype=np.uint8).reshape(self.shape)
+
+    def grab(self):
+        """
+        Skip the next frame.
+
+        :return: True, or False at the end of the video.
+        """
+        ret, _ = self.read()
+        return ret
+
+    def release(self):
+        """
+        Stop ffmpeg and the thread feeding it. The thread is a daemon, it's
+        left behind if it doesn't stop within `FEEDER_TIMEOUT`.
+
+        :return: None
+        """
+        self.closed = True
+        self.process.stdout.close()
+        self.process.kill()
+        self.process.wait()
+        self.feeder.join(FEEDER_TIMEOUT)
+        self.logger.join(FEEDER_TIMEOUT)
+        self.process.stderr.close()
+        self.raise_error()
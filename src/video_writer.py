@@ -0,0 +1,192 @@
+import os
+import cv2
+import tempfile
+import numpy as np
+import subprocess
+
+# Size of `assets/black_image.png`, the canvas the video gets centered on
+CANVAS_WIDTH = 1920
+CANVAS_HEIGHT = 1080
+
+# Seconds of black frames appended after the data frames
+PADDING_DURATION = 30
+
+
+def get_ffmpeg_exe():
+    """
+    Get the ffmpeg executable, preferring the one shipped with `imageio-ffmpeg`.
+
+    :return: The path to the ffmpeg executable.
+    """
+    try:
+        from imageio_ffmpeg import get_ffmpeg_exe as get_imageio_ffmpeg_exe
+
+        return get_imageio_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+
+class FFmpegWriter:
+    """
+    Drop-in replacement for `cv2.VideoWriter` that pipes raw frames into a
+    single ffmpeg/libx264 process. The frames are centered on the black canvas
+    and padded in the same pass, so the result can be uploaded as-is
+    (see `yt.prep_video`).
+    """
+
+    def __init__(self, dest, frame_rate, dim):
+        """
+        Start the ffmpeg process.
+
+        :param dest: The output file path.
+        :param frame_rate: The frame rate.
+        :param dim: The frame dimensions (width, height).
+        """
+        width, height = dim
+        filters = ",".join(
+            [
+                f"pad={CANVAS_WIDTH}:{CANVAS_HEIGHT}:(ow-iw)/2:(oh-ih)/2:black",
+                f"tpad=stop_mode=add:stop_duration={PADDING_DURATION}:color=black",
+            ]
+        )
+        command = [
+            get_ffmpeg_exe(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(frame_rate),
+            "-i",
+            "-",
+            "-vf",
+            filters,
+            "-c:v",
+            "libx264",
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            dest,
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        """
+        Write a frame.
+
+        :param frame: The frame (BGR).
+
+        :return: None
+        """
+        self.process.stdin.write(frame.tobytes())
+
+    def release(self):
+        """
+        Finish the video and wait for ffmpeg to exit.
+
+        :return: None
+        """
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise Exception(f"ffmpeg exited with code {self.process.returncode}")
+
+
+def open_video_writer(dest, frame_rate, dim, writer="opencv"):
+    """
+    Open a video writer.
+
+    :param dest: The output file path.
+    :param frame_rate: The frame rate.
+    :param dim: The frame dimensions (width, height).
+    :param writer: `opencv` (mp4v, prepared later by `yt.prep_video`) or `ffmpeg`.
+
+    :return: The video writer.
+    """
+    if writer == "ffmpeg":
+        return FFmpegWriter(dest, frame_rate, dim)
+    elif writer == "opencv":
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        return cv2.VideoWriter(dest, fourcc, frame_rate, dim)
+    else:
+        raise Exception("Invalid video writer.")
+
+
+def get_padding_tail(src):
+    """
+    Get a video of black frames matching a video written by the `opencv` writer
+    (size, frame rate and codec), so the two can be joined without re-encoding.
+    Tails are rendered once and kept next to the video, this is safe to call from several threads.
+
+    :param src: The video path.
+
+    :return: The path of the tail.
+    """
+    cap = cv2.VideoCapture(src)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    tail_path = os.path.join(os.path.dirname(os.path.abspath(src)), f"padding-{width}x{height}-{frame_rate:g}.mp4")
+    if not os.path.exists(tail_path):
+        # Uploads prepare videos at the same time, every one renders into its own file.
+        # The finished tails are identical, whichever is moved into place last wins.
+        fd, part_path = tempfile.mkstemp(suffix=".part.mp4", dir=os.path.dirname(tail_path))
+        os.close(fd)
+        try:
+            out = open_video_writer(part_path, frame_rate, (width, height))
+            black_frame = np.zeros((height, width, 3), dtype=np.uint8)
+            for _ in range(round(PADDING_DURATION * frame_rate)):
+                out.write(black_frame)
+            out.release()
+            os.replace(part_path, tail_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    return tail_path
+
+
+def append_padding(src):
+    """
+    Append `PADDING_DURATION` seconds of black frames to a video written by the
+    `opencv` writer. The streams are copied, the data frames are never re-encoded.
+
+    :param src: The video path.
+
+    :return: None
+    """
+    list_path = src + ".concat.txt"
+    padded_path = src + ".padded.mp4"
+    with open(list_path, "w") as list_file:
+        for path in (os.path.abspath(src), get_padding_tail(src)):
+            list_file.write("file '{}'\n".format(path.replace("'", "'\\''")))
+
+    command = [
+        get_ffmpeg_exe(),
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        list_path,
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        padded_path,
+    ]
+    try:
+        if subprocess.run(command).returncode != 0:
+            raise Exception(f"Cannot append padding to {src}")
+        os.replace(padded_path, src)
+    finally:
+        os.remove(list_path)
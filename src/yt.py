@@ -1,25 +1,59 @@
 import os
+import re
 import cv2
-import json
-import time
-import base64
-import hashlib
+import itertools
+import urllib.parse
+import urllib.request
 
 from config import *
-from tqdm import tqdm
-from pyzbar import pyzbar
+from journal import Journal
 from pytube import YouTube
 from termcolor import colored
-from selenium import webdriver
+from video2file import Decoder
+from video_writer import append_padding
+from video_reader import FFmpegReader
+from browser_pool import get_browser_pool
+from emulator import get_emulator
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
-from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
-FIREFOX_PROFILE_LOCATION = get_firefox_profile_location()
-HEADLESS = get_headless()
 VERBOSE = get_verbose()
 USE_OAUTH = get_use_oauth()
-CHANNEL_ID = get_channel_id()
+VIDEO_WRITER = get_video_writer()
+STREAM_RESTORE = get_stream_restore()
+UPLOAD_TIMEOUT = get_upload_timeout()
+TRANSPORT = get_transport()
+PREPROCESS = get_preprocess()
+
+# Seconds to wait for an element of the upload dialog
+STEP_TIMEOUT = 30
+
+# Seconds between two reads of the upload progress
+UPLOAD_POLL_INTERVAL = 1
+
+# Progress of the upload dialog, it has the `uploading` attribute while the file is sent (in every UI language)
+UPLOAD_PROGRESS_ELEMENT = "ytcp-video-upload-progress"
+UPLOADING_ATTRIBUTE = "uploading"
+
+# Progress label of the upload dialog, e.g. "Uploading 42% ... 3 minutes left"
+UPLOAD_PROGRESS_SELECTOR = UPLOAD_PROGRESS_ELEMENT + " .progress-label"
+UPLOAD_PERCENT = re.compile(r"(\d+)\s*%")
+
+# Share link of the video in the upload dialog, e.g. "https://youtu.be/<video id>"
+VIDEO_LINK_SELECTOR = "span.video-url-fadeable a"
+
+# Fallback for the English Studio UI, the label shows one of these once the file is uploaded
+UPLOAD_DONE_TEXTS = ("Upload complete", "Processing", "Checks complete")
+
+# Bytes requested per HTTP range request, larger unranged downloads get throttled
+STREAM_RANGE_SIZE = 9 * 1024 * 1024
+
+# Bytes passed on to the decoder at once
+STREAM_READ_SIZE = 64 * 1024
+
+# Seconds a range request may stall before the download fails
+STREAM_TIMEOUT = 60
 
 
 def build_url(video_id):
@@ -33,50 +67,73 @@ def build_url(video_id):
     return f"https://www.youtube.com/watch?v={video_id}"
 
 
-def prep_video(src):
+def get_video_id(url):
     """
-    Prepares a video for uploading to YouTube (resolution, frame rate, etc.) using moviepy.
+    Get the video ID from a YouTube video URL (see `build_url`).
 
-    :param src: The source file path.
+    :param url: The YouTube video URL.
 
-    :return: The prepared video path.
+    :return: The video ID.
     """
-    if VERBOSE:
-        print(colored(f"\n[+] Preparing video for YouTube...", "light_cyan"))
-    else:
-        print()
+    return urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["v"][0]
 
-    video = VideoFileClip(src)
 
-    original_duration = video.duration
+def set_transport(name):
+    """
+    Switch the transport of this process.
 
-    # Combine video with black image
-    black_image = ImageClip("assets/black_image.png")
-    video = CompositeVideoClip(
-        [black_image, video.set_position("center")]
-    ).set_duration(video.duration + 30)
+    :param name: The transport (`youtube` or `emulator`), or None to go back to the one from the config.
 
-    # Wait a bit, for the video to be processed
-    time.sleep(0.5)
+    :return: None
+    """
+    global TRANSPORT
+    TRANSPORT = get_transport() if name is None else name
+
+
+def open_video(url):
+    """
+    Look up a video with the configured transport (`youtube` or `emulator`).
 
-    # Write video to temporary file
-    if not VERBOSE:
-        video.write_videofile(src, codec="libx264", audio_codec="aac", logger=None)
+    :param url: The YouTube video URL.
+
+    :return: The video title and the URL of the video file (highest resolution).
+    """
+    if TRANSPORT == "youtube":
+        video = YouTube(url, use_oauth=USE_OAUTH, allow_oauth_cache=USE_OAUTH)
+        return video.title, video.streams.get_highest_resolution().url
+    elif TRANSPORT == "emulator":
+        return get_emulator().get_video(get_video_id(url))
     else:
-        video.write_videofile(src, codec="libx264", audio_codec="aac")
+        raise Exception("Invalid transport.")
+
+
+def prep_video(src):
+    """
+    Prepares a video for uploading to YouTube by appending black padding frames.
+    The data frames are never re-encoded.
+
+    :param src: The source file path.
+
+    :return: The prepared video path.
+    """
+    if VIDEO_WRITER == "ffmpeg":
+        # `file2video` already padded and encoded the video in a single pass
+        return os.path.abspath(src)
 
     if VERBOSE:
-        print(colored(f"[+] Prepared video for YouTube: {src}", "light_green"))
+        print(colored("\n[+] Preparing video for YouTube...", "light_cyan"))
 
-    # Get full path of src
-    src = os.path.abspath(src)
+    append_padding(src)
 
-    return original_duration, src
+    if VERBOSE:
+        print(colored(f"[+] Prepared video for YouTube: {src}", "light_green"))
+
+    return os.path.abspath(src)
 
 
 def upload_video(src, hash_id, original_file_name):
     """
-    Upload a video to YouTube.
+    Upload a video to YouTube, with a browser from the pool (see `browser_pool`).
 
     :param src: The source file path.
     :param hash_id: The UUID string.
@@ -85,213 +142,468 @@ def upload_video(src, hash_id, original_file_name):
     :return: The YouTube video URL.
     """
     try:
-        duration, updated_path = prep_video(src)
+        updated_path = prep_video(src)
 
-        print(colored(f"\n[+] Uploading video to YouTube...", "light_cyan"))
+        print(colored("\n[+] Uploading video to YouTube...", "light_cyan"))
 
-        # Set options
-        options = Options()
+        if TRANSPORT == "youtube":
+            # A failed upload leaves the browser in an unknown state, the pool restarts it
+            with get_browser_pool().session() as driver:
+                url = upload_with_driver(driver, updated_path, hash_id, original_file_name)
+        elif TRANSPORT == "emulator":
+            url = build_url(get_emulator().upload(updated_path, hash_id, original_file_name))
+        else:
+            raise Exception("Invalid transport.")
 
-        if HEADLESS:
-            options.add_argument("--headless")
+        if VERBOSE:
+            print(colored(f"[+] Uploaded to YouTube: {url}", "light_green"))
 
-        # Instantiate Webdriver using Firefox profile
-        fp = webdriver.FirefoxProfile(FIREFOX_PROFILE_LOCATION)
-        driver = webdriver.Firefox(firefox_profile=fp, options=options)
+        return url
+    except Exception as error:
+        print(
+            colored(
+                f"\n[-] An error occurred while uploading the video to YouTube: {error}",
+                "light_red",
+            )
+        )
 
-        # Navigate to YouTube
-        driver.get("https://www.youtube.com/upload")
 
-        # Set video file
-        FILE_PICKER_TAG = "ytcp-uploads-file-picker"
-        file_picker = driver.find_element(By.TAG_NAME, FILE_PICKER_TAG)
-        INPUT_TAG = "input"
-        file_input = file_picker.find_element(By.TAG_NAME, INPUT_TAG)
-        file_input.send_keys(updated_path)
+def get_video_link(driver):
+    """
+    Read the share link of the video from the upload dialog. It is empty until YouTube assigned an ID.
 
-        # Wait for upload to finish
-        time.sleep(5)
+    :param driver: The driver, showing the upload dialog.
 
-        # Set title & description
-        TEXTBOX_ID = "textbox"
-        textboxes = driver.find_elements(By.ID, TEXTBOX_ID)
+    :return: The link, or False if there is none yet (for `WebDriverWait`).
+    """
+    for anchor in driver.find_elements(By.CSS_SELECTOR, VIDEO_LINK_SELECTOR):
+        href = anchor.get_attribute("href")
+        if href:
+            return href
+    return False
 
-        title_el = textboxes[0]
-        description_el = textboxes[-1]
 
-        if VERBOSE:
-            print(colored("\t=> Setting title...", "yellow"))
-        title_el.click()
-        time.sleep(0.5)
-        title_el.clear()
-        title_el.send_keys(str(duration) + "::::" + original_file_name)
+def wait_for_upload(driver, timeout):
+    """
+    Wait until the upload dialog reports the file as uploaded, reporting the
+    progress it shows on the way. Leaving the page earlier cancels the upload.
+    The upload is done once the progress loses its `uploading` attribute or reaches 100%,
+    so it doesn't depend on the language of the Studio UI.
 
-        if VERBOSE:
-            print(colored("\t=> Setting description...", "yellow"))
-        time.sleep(0.5)
-        description_el.click()
-        time.sleep(0.5)
-        description_el.clear()
-        description_el.send_keys(hash_id)
+    :param driver: The driver, showing the upload dialog.
+    :param timeout: The maximum time to wait, in seconds.
 
-        time.sleep(0.5)
+    :return: The last progress text.
+    """
+    last_percent = None
 
-        # Set `made for kids` option
-        if VERBOSE:
-            print(colored("\t=> Setting `made for kids` option...", "yellow"))
-        MADE_FOR_KIDS_NAME = "VIDEO_MADE_FOR_KIDS_MFK"
-        NOT_MADE_FOR_KIDS_NAME = "VIDEO_MADE_FOR_KIDS_NOT_MFK"
+    def upload_finished(driver):
+        nonlocal last_percent
+        progress = driver.find_elements(By.CSS_SELECTOR, UPLOAD_PROGRESS_ELEMENT)
+        labels = driver.find_elements(By.CSS_SELECTOR, UPLOAD_PROGRESS_SELECTOR)
+        text = labels[0].text if labels else ""
+        match = UPLOAD_PERCENT.search(text)
+        if progress and progress[0].get_attribute(UPLOADING_ATTRIBUTE) is None:
+            return text or "Upload complete"
+        if (match and int(match.group(1)) >= 100) or any(done_text in text for done_text in UPLOAD_DONE_TEXTS):
+            return text
 
-        is_for_kids_checkbox = driver.find_element(By.NAME, MADE_FOR_KIDS_NAME)
-        is_not_for_kids_checkbox = driver.find_element(By.NAME, NOT_MADE_FOR_KIDS_NAME)
+        if match and match.group(1) != last_percent:
+            last_percent = match.group(1)
+            if VERBOSE:
+                print(colored(f"\t=> {text}", "yellow"))
+        return False
 
-        if True:
-            is_not_for_kids_checkbox.click()
-        else:
-            is_for_kids_checkbox.click()
+    return WebDriverWait(driver, timeout, poll_frequency=UPLOAD_POLL_INTERVAL).until(upload_finished)
+
+
+def upload_with_driver(driver, path, hash_id, original_file_name):
+    """
+    Walk through the upload dialog of YouTube Studio. Every step waits for
+    the element it needs instead of sleeping for a fixed time.
+
+    :param driver: The driver (logged in).
+    :param path: The absolute path of the prepared video.
+    :param hash_id: The UUID string.
+    :param original_file_name: The original file name.
+
+    :return: The YouTube video URL.
+    """
+    wait = WebDriverWait(driver, STEP_TIMEOUT)
 
-        time.sleep(0.5)
+    # Navigate to YouTube
+    driver.get("https://www.youtube.com/upload")
 
-        # Click next
+    # Set video file
+    FILE_PICKER_TAG = "ytcp-uploads-file-picker"
+    file_picker = wait.until(EC.presence_of_element_located((By.TAG_NAME, FILE_PICKER_TAG)))
+    INPUT_TAG = "input"
+    file_input = file_picker.find_element(By.TAG_NAME, INPUT_TAG)
+    file_input.send_keys(path)
+
+    # Wait for the details form, it opens once the upload started
+    TEXTBOX_ID = "textbox"
+    wait.until(lambda driver: len(driver.find_elements(By.ID, TEXTBOX_ID)) >= 2)
+    textboxes = driver.find_elements(By.ID, TEXTBOX_ID)
+
+    title_el = textboxes[0]
+    description_el = textboxes[-1]
+
+    if VERBOSE:
+        print(colored("\t=> Setting title...", "yellow"))
+    wait.until(EC.element_to_be_clickable(title_el)).click()
+    title_el.clear()
+    title_el.send_keys(original_file_name)
+
+    if VERBOSE:
+        print(colored("\t=> Setting description...", "yellow"))
+    wait.until(EC.element_to_be_clickable(description_el)).click()
+    description_el.clear()
+    description_el.send_keys(hash_id)
+
+    # Set `made for kids` option
+    if VERBOSE:
+        print(colored("\t=> Setting `made for kids` option...", "yellow"))
+    MADE_FOR_KIDS_NAME = "VIDEO_MADE_FOR_KIDS_MFK"
+    NOT_MADE_FOR_KIDS_NAME = "VIDEO_MADE_FOR_KIDS_NOT_MFK"
+
+    if True:
+        wait.until(EC.element_to_be_clickable((By.NAME, NOT_MADE_FOR_KIDS_NAME))).click()
+    else:
+        wait.until(EC.element_to_be_clickable((By.NAME, MADE_FOR_KIDS_NAME))).click()
+
+    # Click next until the visibility step shows up (details, video elements, checks)
+    NEXT_BUTTON_ID = "next-button"
+    RADIO_BUTTON_XPATH = '//*[@id="radioLabel"]'
+    for _ in range(3):
         if VERBOSE:
             print(colored("\t=> Clicking next...", "yellow"))
-        NEXT_BUTTON_ID = "next-button"
-        next_button = driver.find_element(By.ID, NEXT_BUTTON_ID)
-        next_button.click()
+        wait.until(EC.element_to_be_clickable((By.ID, NEXT_BUTTON_ID))).click()
+    wait.until(EC.visibility_of_any_elements_located((By.XPATH, RADIO_BUTTON_XPATH)))
 
-        # Click next again
-        if VERBOSE:
-            print(colored("\t=> Clicking next again...", "yellow"))
-        next_button = driver.find_element(By.ID, NEXT_BUTTON_ID)
-        next_button.click()
+    # Set as unlisted
+    if VERBOSE:
+        print(colored("\t=> Setting as unlisted...", "yellow"))
+    radio_button = driver.find_elements(By.XPATH, RADIO_BUTTON_XPATH)
+    wait.until(EC.element_to_be_clickable(radio_button[1])).click()
 
-        # Wait for 2 seconds
-        time.sleep(2)
+    # The dialog links to the video it is uploading, unlike the channel's video list this can't mix up uploads
+    if VERBOSE:
+        print(colored("\t=> Getting video URL...", "yellow"))
+    href = wait.until(get_video_link)
+    if VERBOSE:
+        print(colored(f"\t=> Extracting video ID from URL: {href}", "yellow"))
+    video_id = href.split("?")[0].rstrip("/").split("/")[-1]
 
-        # Click next again
-        if VERBOSE:
-            print(colored("\t=> Clicking next again...", "yellow"))
-        next_button = driver.find_element(By.ID, NEXT_BUTTON_ID)
-        next_button.click()
+    # The upload is cancelled if the page is left before it finished
+    if VERBOSE:
+        print(colored("\t=> Waiting for the upload to finish...", "yellow"))
+    progress = wait_for_upload(driver, UPLOAD_TIMEOUT)
+    if VERBOSE:
+        print(colored(f"\t=> {progress}", "yellow"))
 
-        # Set as unlisted
-        if VERBOSE:
-            print(colored("\t=> Setting as unlisted...", "yellow"))
-        RADIO_BUTTON_XPATH = '//*[@id="radioLabel"]'
-        radio_button = driver.find_elements(By.XPATH, RADIO_BUTTON_XPATH)
-        radio_button[1].click()
+    if VERBOSE:
+        print(colored("\t=> Clicking done button...", "yellow"))
+    # Click done button
+    DONE_BUTTON_ID = "done-button"
+    done_button = wait.until(EC.element_to_be_clickable((By.ID, DONE_BUTTON_ID)))
+    done_button.click()
 
-        if VERBOSE:
-            print(colored("\t=> Clicking done button...", "yellow"))
-        # Click done button
-        DONE_BUTTON_ID = "done-button"
-        done_button = driver.find_element(By.ID, DONE_BUTTON_ID)
-        done_button.click()
+    # The dialog closes once the video is saved
+    wait.until(EC.invisibility_of_element(done_button))
 
-        # Wait for 2 seconds
-        time.sleep(2)
+    # Build URL
+    return build_url(video_id)
 
-        # Get latest video
-        if VERBOSE:
-            print(colored("\t=> Getting video URL...", "yellow"))
-
-        driver.get(f"https://studio.youtube.com/channel/{CHANNEL_ID}/videos/")
-        time.sleep(2)
-        videos = driver.find_elements(By.TAG_NAME, "ytcp-video-row")
-        first_video = videos[0]
-        anchor_tag = first_video.find_element(By.TAG_NAME, "a")
-        href = anchor_tag.get_attribute("href")
-        if VERBOSE:
-            print(colored(f"\t=> Extracting video ID from URL: {href}", "yellow"))
-        video_id = href.split("/")[-2]
 
-        # Build URL
-        url = build_url(video_id)
+def get_original_file_path(title):
+    """
+    Get the original file path from a video title. Older uploads prefix
+    the title with the duration of the data frames (`<duration>::::<path>`).
 
-        # Close driver
-        driver.close()
+    :param title: The video title.
 
+    :return: The original file path.
+    """
+    return title.split("::::")[-1]
+
+
+def open_journal(url, output_path, file_path):
+    """
+    Open the journal of a restore, kept next to the decoded file. If a previous
+    attempt at the same video left one behind, its partial download is reused.
+
+    :param url: The YouTube video URL.
+    :param output_path: The output path of the video, if there is nothing to resume.
+    :param file_path: The path of the decoded file.
+
+    :return: The journal and the output path of the video.
+    """
+    journal = Journal(file_path + ".journal")
+    video_path = journal.get("video_path")
+    if journal.get("url") == url and video_path and os.path.exists(video_path):
         if VERBOSE:
-            print(colored(f"[+] Uploaded to YouTube: {url}", "light_green"))
+            print(colored(f"[+] Resuming restore from {journal.path}", "light_cyan"))
+        return journal, video_path
 
-        return url
-    except Exception as error:
-        print(
-            colored(
-                f"\n[-] An error occurred while uploading the video to YouTube: {error}",
-                "light_red",
+    journal.reset(url=url, video_path=output_path)
+    return journal, output_path
+
+
+def download_media(media_url, output_path, journal=None):
+    """
+    Download a video file, without decoding it.
+
+    :param media_url: The URL of the video file (see `open_video`).
+    :param output_path: The output path.
+    :param journal: A journal to record the downloaded bytes in, and to resume from.
+
+    :return: True if the download finished, False otherwise.
+    """
+    # The padding is left in place, the decoder stops after the data frames
+    try:
+        for _ in iter_media(media_url, output_path, journal):
+            pass
+    except Exception as e:
+        print(colored(f"[-] Failed to download video from YouTube: {e}", "light_red"))
+        return False
+    return True
+
+
+def fetch_video(url, output_path):
+    """
+    Download a YouTube video by URL, without decoding it.
+
+    :param url: The YouTube video URL.
+    :param output_path: The output path.
+
+    :return: The video title, or None if the download failed.
+    """
+    if VERBOSE:
+        print(colored(f"\n[+] Downloading video from YouTube...", "light_cyan"))
+    print(colored(url, "light_green"))
+    title, media_url = open_video(url)
+    if not download_media(media_url, output_path):
+        return
+
+    return title
+
+
+def iter_file(file_path, length):
+    """
+    Lazy function (generator) to read the start of a file piece by piece.
+
+    :param file_path: The file path.
+    :param length: The amount of bytes to read.
+
+    :return: The bytes.
+    """
+    if length <= 0:
+        return
+    with open(file_path, "rb") as file:
+        while length > 0:
+            piece = file.read(min(STREAM_READ_SIZE, length))
+            if not piece:
+                break
+            length -= len(piece)
+            yield piece
+
+
+def iter_media(media_url, output_path, journal=None):
+    """
+    Lazy function (generator) to download a video piece by piece with HTTP range
+    requests, saving it to a file on the way.
+
+    :param media_url: The URL of the video file.
+    :param output_path: The output path.
+    :param journal: A journal to record the downloaded bytes in, and to resume from.
+        Only the new bytes are yielded, see `iter_file` for the ones before.
+
+    :return: The downloaded bytes.
+    """
+    downloaded = journal.get("downloaded", 0) if journal is not None else 0
+    media_size = journal.get("media_size") if journal is not None else None
+    if downloaded and media_size is not None and downloaded >= media_size:
+        return
+
+    if downloaded:
+        file = open(output_path, "r+b")
+        # Anything after the last recorded range may not have been flushed
+        file.truncate(downloaded)
+        file.seek(downloaded)
+    else:
+        file = open(output_path, "wb")
+
+    with file:
+        while True:
+            request = urllib.request.Request(
+                media_url,
+                headers={"Range": f"bytes={downloaded}-{downloaded + STREAM_RANGE_SIZE - 1}"},
             )
-        )
+            with urllib.request.urlopen(request, timeout=STREAM_TIMEOUT) as response:
+                # Servers without range support send everything at once
+                content_range = response.headers.get("Content-Range")
+                if response.status != 206 and downloaded:
+                    file.seek(0)
+                    file.truncate()
+                    downloaded = 0
+                for piece in iter(lambda: response.read(STREAM_READ_SIZE), b""):
+                    file.write(piece)
+                    downloaded += len(piece)
+                    yield piece
+            if content_range:
+                media_size = int(content_range.rpartition("/")[2])
+            if journal is not None:
+                file.flush()
+                os.fsync(file.fileno())
+                journal.update(downloaded=downloaded, media_size=media_size)
+            if response.status != 206 or not content_range:
+                break
+            if downloaded >= media_size:
+                break
+
+    if journal is not None:
+        journal.update(downloaded=downloaded, media_size=downloaded)
+
+
+def verify_file(decoder, file_path):
+    """
+    Verify a decoded file and report the result.
 
+    :param decoder: The decoder that wrote the file.
+    :param file_path: The file path.
 
-def checksum(large_file):
-    md5_object = hashlib.md5()
-    block_size = 128 * md5_object.block_size
-    a_file = open(large_file, "rb")
-    chunk = a_file.read(block_size)
-    while chunk:
-        md5_object.update(chunk)
-        chunk = a_file.read(block_size)
-    md5_hash = md5_object.hexdigest()
+    :return: False if the file is corrupt, True otherwise.
+    """
+    verified = decoder.verify(file_path)
+    if verified is False:
+        print(colored(f"[-] Integrity check failed: {file_path}", "light_red"))
+        return False
+    if verified is None:
+        print(colored(f"[!] No checksum to verify against: {file_path}", "yellow"))
+    elif VERBOSE:
+        print(colored(f"[+] Integrity check passed: {file_path}", "light_green"))
+    return True
+
+
+def restore_stream(media_url, output_path, file_path, merkle_root=None, journal=None):
+    """
+    Decode a video while it is downloading, so the restore takes about as long
+    as the slower of the two instead of both.
 
-    return md5_hash
+    :param media_url: The URL of the video file.
+    :param output_path: The output path of the video.
+    :param file_path: The path to write the decoded file to.
+    :param merkle_root: The expected Merkle root, if known.
+    :param journal: A journal to checkpoint the download and the decode in, and to resume from.
 
+    :return: The file path, or None if the first frame can't be read or the file is corrupt.
+    """
+    # ffmpeg needs the video from the start, the bytes of an earlier attempt are read back first
+    downloaded = journal.get("downloaded", 0) if journal is not None else 0
+    pieces = itertools.chain(iter_file(output_path, downloaded), iter_media(media_url, output_path, journal))
 
-def read_the_barc(frame):
-    barcodes = pyzbar.decode(frame)
-    for barcode in barcodes:
-        barcode_info = barcode.data.decode("utf-8")
-        return True, barcode_info
-    return False, 0
+    reader = FFmpegReader(pieces, gray="grayscale" in PREPROCESS)
+    try:
+        decoder = Decoder(merkle_root=merkle_root)
+        if not decoder.read_header(reader):
+            print(colored("[-] Can't parse first frame of QR Code.", "light_red"))
+            return
+        decoder.write_file(reader, file_path, journal)
+    finally:
+        reader.release()
+
+    if not verify_file(decoder, file_path):
+        return
+    return file_path
 
 
-def download_video(url, output_path):
+def stream_video(url, output_path, merkle_root=None):
     """
-    Download a YouTube video by URL.
+    Download a YouTube video by URL, decoding it while it downloads.
 
     :param url: The YouTube video URL.
     :param output_path: The output path.
+    :param merkle_root: The expected Merkle root, if known.
 
     :return: Original file path.
     """
     if VERBOSE:
-        print(colored(f"\n[+] Downloading video from YouTube...", "light_cyan"))
+        print(colored("\n[+] Streaming video from YouTube...", "light_cyan"))
     print(colored(url, "light_green"))
-    video = YouTube(url, use_oauth=USE_OAUTH, allow_oauth_cache=USE_OAUTH)
-    original_file_path = video.title.split("::::")[1]
-    best = video.streams.get_highest_resolution()
+    title, media_url = open_video(url)
+    original_file_path = get_original_file_path(title)
 
-    # Cut duration
-    duration = float(video.title.split("::::")[0])
+    if os.path.dirname(original_file_path):
+        os.makedirs(os.path.dirname(original_file_path), exist_ok=True)
+    journal, output_path = open_journal(url, output_path, original_file_path)
 
     try:
-        best.download(filename=output_path)
+        file_path = restore_stream(media_url, output_path, original_file_path, merkle_root, journal)
     except Exception as e:
-        print(colored(f"[-] Failed to download video from YouTube: {e}", "light_red"))
+        print(colored(f"[-] Failed to stream video from YouTube: {e}", "light_red"))
         return
 
-    # Set Duration
-    clip = VideoFileClip(output_path)
-    clip = clip.subclip(0, float(duration))
-    if not VERBOSE:
-        clip.write_videofile(
-            output_path, codec="libx264", audio_codec="aac", logger=None
-        )
-    else:
-        clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
+    # A corrupt file would be corrupt again, the next attempt starts over
+    journal.remove()
+    return file_path
 
-    time.sleep(2)
 
-    cap = cv2.VideoCapture(output_path)
-    ret, first_frame = cap.read()
-    res, retval = read_the_barc(first_frame)
-    if not res:
-        print(colored("[-] Can't parse first frame of QR Code.", "light_red"))
+def decode_video(video_path, file_path, merkle_root=None, journal=None):
+    """
+    Decode a downloaded video to a file and verify it.
+
+    :param video_path: The video path.
+    :param file_path: The path to write the decoded file to.
+    :param merkle_root: The expected Merkle root, if known (used if the trailer frame can't be read).
+    :param journal: A journal to checkpoint the decode in, and to resume from. Removed once the decode finished.
+
+    :return: The file path, or None if the video can't be decoded or the file is corrupt.
+    """
+    cap = cv2.VideoCapture(video_path)
+    decoder = Decoder(merkle_root=merkle_root)
+    try:
+        if not decoder.read_header(cap):
+            print(colored("[-] Can't parse first frame of QR Code.", "light_red"))
+            return
+        decoder.write_file(cap, file_path, journal)
+    except Exception as e:
+        # The journal is kept, the next attempt continues from the last checkpoint
+        print(colored(f"[-] Failed to decode video from YouTube: {e}", "light_red"))
+        return
+    finally:
+        cap.release()
+
+    # A corrupt file would be corrupt again, the next attempt starts over
+    if journal is not None:
+        journal.remove()
+    if not verify_file(decoder, file_path):
         return
-    meta_data = json.loads(retval)
+    return file_path
+
+
+def download_video(url, output_path, merkle_root=None):
+    """
+    Download a YouTube video by URL. An interrupted restore continues from its
+    journal (see `open_journal`) the next time it is started.
+
+    :param url: The YouTube video URL.
+    :param output_path: The output path.
+    :param merkle_root: The expected Merkle root, if known (used if the trailer frame can't be read).
+
+    :return: Original file path.
+    """
+    if STREAM_RESTORE:
+        return stream_video(url, output_path, merkle_root)
+
+    if VERBOSE:
+        print(colored("\n[+] Downloading video from YouTube...", "light_cyan"))
+    print(colored(url, "light_green"))
+    title, media_url = open_video(url)
+    original_file_path = get_original_file_path(title)
 
     # Recursively create directories
-    if not os.path.exists(os.path.dirname(original_file_path)):
+    if os.path.dirname(original_file_path) and not os.path.exists(os.path.dirname(original_file_path)):
         if VERBOSE:
             print(
                 colored(
@@ -308,26 +620,86 @@ def download_video(url, output_path):
                 )
             )
 
-    file = open(original_file_path, "wb")
-
-    pbar = tqdm(total=meta_data["ChunkCount"])
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if ret:
-            res, retval = read_the_barc(frame)
-            assert res
-            file.write(base64.b64decode(retval))
-            pbar.update(1)
-        else:
-            break
+    journal, output_path = open_journal(url, output_path, original_file_path)
+    if not download_media(media_url, output_path, journal):
+        return
 
-    pbar.close()
-    file.close()
+    if not decode_video(output_path, original_file_path, merkle_root, journal):
+        return
 
-    # md5_sum = checksum(output_path)
     if VERBOSE:
         print(
-            colored(f"[+] Downloaded video from YouTube: {video.title}", "light_green")
+            colored(f"[+] Downloaded video from YouTube: {title}", "light_green")
         )
 
     return original_file_path
+
+
+def read_video_ranges(video_path, ranges):
+    """
+    Lazy function (generator) to decode byte ranges of a downloaded video,
+    seeking to the frames holding every range instead of decoding the whole video.
+
+    :param video_path: The video path.
+    :param ranges: A list of (offset, length) tuples, best sorted by offset so every seek goes forward.
+
+    :return: The bytes of every range, in order. Nothing if the first frame can't be read.
+    """
+    cap = cv2.VideoCapture(video_path)
+    decoder = Decoder()
+    try:
+        if not decoder.read_header(cap):
+            print(colored("[-] Can't parse first frame of QR Code.", "light_red"))
+            return
+
+        # Compressed videos can't be cut into ranges, decode everything and slice it
+        if decoder.meta_data.get("Compression"):
+            payload_path = video_path + ".payload"
+            decoder.write_file(cap, payload_path)
+            try:
+                with open(payload_path, "rb") as payload:
+                    for offset, length in ranges:
+                        payload.seek(offset)
+                        yield payload.read(length)
+            finally:
+                os.remove(payload_path)
+        else:
+            for offset, length in ranges:
+                yield decoder.read_range(cap, offset, length)
+    finally:
+        cap.release()
+
+
+def download_video_range(url, output_path, offset, length, file_path):
+    """
+    Download a YouTube video by URL, and only decode a byte range of it
+    (e.g. a single file of a pack video).
+
+    :param url: The YouTube video URL.
+    :param output_path: The output path of the video.
+    :param offset: The offset of the range.
+    :param length: The length of the range.
+    :param file_path: The path to write the range to.
+
+    :return: The file path.
+    """
+    title = fetch_video(url, output_path)
+    if title is None:
+        return
+
+    try:
+        data = next(read_video_ranges(output_path, [(offset, length)]), None)
+    finally:
+        os.remove(output_path)
+    if data is None:
+        return
+
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as file:
+        file.write(data)
+
+    if VERBOSE:
+        print(colored(f"[+] Extracted {length} bytes from: {title}", "light_green"))
+
+    return file_path